@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+"""
+Startup benchmark of the ofrestapi package
+
+Every scenario runs in a fresh interpreter. The time of an empty interpreter
+is subtracted, so the numbers are the cost of the imports alone. The script
+exits with status 1 when a scenario is slower than `--max-ms` or when a bare
+`import ofrestapi` loads the HTTP stack.
+
+    python benchmarks/import_time.py --runs 20 --max-ms 15
+"""
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SCENARIOS = (
+    ('import ofrestapi', 'import ofrestapi'),
+    ('System class', 'from ofrestapi import System'),
+    ('System client', "from ofrestapi import System; System('http://localhost:9090', 'secret')"),
+    ('all classes', 'from ofrestapi import Users, Muc, System, Groups, Sessions, Messages'),
+)
+
+# Modules that a bare `import ofrestapi` must not load
+HEAVY_MODULES = ('requests', 'urllib3', 'httpx', 'concurrent.futures')
+
+
+def run(code, runs):
+    """
+    Return the median seconds of running `code` in a fresh interpreter
+    """
+    env = dict(os.environ, PYTHONPATH=ROOT)
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.check_call([sys.executable, '-c', code], env=env)
+        timings.append(time.perf_counter() - start)
+    timings.sort()
+    return timings[len(timings) // 2]
+
+
+def loaded_modules(code):
+    """
+    Return the heavy modules loaded by `code`
+    """
+    check = '%s\nimport sys\nprint(" ".join(m for m in %r if m in sys.modules))' % (code, HEAVY_MODULES)
+    output = subprocess.check_output([sys.executable, '-c', check], env=dict(os.environ, PYTHONPATH=ROOT))
+    return output.decode().split()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--runs', type=int, default=15, help='interpreter starts per scenario')
+    parser.add_argument('--max-ms', type=float, default=None, help='fail when `import ofrestapi` takes longer')
+    args = parser.parse_args()
+
+    baseline = run('pass', args.runs)
+    failed = False
+    print('%-16s %10s  %s' % ('scenario', 'ms', 'heavy modules loaded'))
+    for name, code in SCENARIOS:
+        elapsed = (run(code, args.runs) - baseline) * 1000
+        modules = loaded_modules(code)
+        print('%-16s %10.1f  %s' % (name, elapsed, ', '.join(modules) or '-'))
+        if code == 'import ofrestapi':
+            if modules:
+                print('  FAIL: import ofrestapi loaded %s' % ', '.join(modules))
+                failed = True
+            if args.max_ms is not None and elapsed > args.max_ms:
+                print('  FAIL: %.1f ms is above the limit of %.1f ms' % (elapsed, args.max_ms))
+                failed = True
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
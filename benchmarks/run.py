@@ -0,0 +1,269 @@
+# -*- coding: utf-8 -*-
+"""
+Throughput and latency benchmarks against the local fake server
+
+Every scenario runs in its own process against its own `FakeOpenfire` and
+reports requests/sec, latency percentiles and the peak resident memory of
+that scenario's client process.
+With `--trace-memory` the peak Python allocation of the scenario is reported
+too, at the price of much slower requests.
+
+    python benchmarks/run.py
+    python benchmarks/run.py latency decode --latency 0.001 --users 50000
+"""
+import argparse
+import multiprocessing
+import os
+import random
+import sys
+import threading
+import time
+import tracemalloc
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ofrestapi import Users, Muc, System, Groups, Sessions, Messages  # noqa: E402
+from ofrestapi.bulk import add_users  # noqa: E402
+from ofrestapi.codec import get_codec  # noqa: E402
+from ofrestapi.instrument import Histogram, Metrics  # noqa: E402
+from ofrestapi.transport import Transport  # noqa: E402
+
+from server import FakeOpenfire  # noqa: E402
+
+SECRET = 'secret'
+
+
+class Report(object):
+    """
+    Latencies and counters of one scenario
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.latency = Histogram()
+        self.errors = 0
+        self.elapsed = 0.0
+        self.rss = None
+        self.traced = None
+        self.extra = {}
+        self._lock = threading.Lock()
+
+    def timed(self, func, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        except Exception:
+            with self._lock:
+                self.errors += 1
+        finally:
+            duration = time.perf_counter() - start
+            with self._lock:
+                self.latency.add(duration)
+
+    def add(self, duration, error=False):
+        with self._lock:
+            self.latency.add(duration)
+            if error:
+                self.errors += 1
+
+    def render(self):
+        count = self.latency.count
+        line = '%-12s %8d req %9.1f req/s  p50 %7.2f ms  p95 %7.2f ms  p99 %7.2f ms  errors %d' % (
+            self.name, count, count / self.elapsed if self.elapsed else 0.0,
+            (self.latency.percentile(50) or 0) * 1000, (self.latency.percentile(95) or 0) * 1000,
+            (self.latency.percentile(99) or 0) * 1000, self.errors)
+        if self.rss is not None:
+            line += '  rss %.1f MiB' % (self.rss / 1048576.0)
+        if self.traced is not None:
+            line += '  traced %.1f MiB' % (self.traced / 1048576.0)
+        for key, value in sorted(self.extra.items()):
+            line += '\n%12s %s: %s' % ('', key, value)
+        return line
+
+
+def serve(conn, options, population):
+    server = FakeOpenfire(**options)
+    server.state.populate(**population)
+    conn.send(server.url)
+    server.serve_forever()
+
+
+class Scenario(object):
+    """
+    Start a populated fake server in a child process and measure the block
+
+    The server runs in its own process, so it neither competes with the
+    client for the GIL nor shows up in the memory figures.
+
+        with Scenario('name', args, users=1000) as (url, transport, report):
+            ...
+    """
+
+    def __init__(self, name, args, **population):
+        self.report = Report(name)
+        self.args = args
+        self.population = population
+
+    def __enter__(self):
+        options = dict(secret=SECRET, latency=self.args.latency, jitter=self.args.jitter,
+                       error_rate=self.args.error_rate)
+        parent, child = multiprocessing.Pipe()
+        self.server = multiprocessing.Process(target=serve, args=(child, options, self.population))
+        self.server.daemon = True
+        self.server.start()
+        url = parent.recv()
+        self.transport = Transport(pool_maxsize=max(10, self.args.workers))
+        if self.args.trace_memory:
+            tracemalloc.start()
+        self.start = time.perf_counter()
+        return url, self.transport, self.report
+
+    def __exit__(self, *exc_info):
+        self.report.elapsed = time.perf_counter() - self.start
+        if self.args.trace_memory:
+            self.report.traced = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+        if resource is not None:
+            # Kilobytes on Linux, bytes on macOS
+            rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            self.report.rss = rss if sys.platform == 'darwin' else rss * 1024
+        self.transport.close()
+        self.server.terminate()
+        self.server.join()
+        if exc_info[0] is None:
+            print(self.report.render())
+
+
+def latency(args):
+    """
+    Sequential single calls over a warm keep-alive connection
+    """
+    with Scenario('latency', args, users=100, rooms=100, props=100) as (url, transport, report):
+        users = Users(url, SECRET, transport=transport)
+        muc = Muc(url, SECRET, transport=transport)
+        system = System(url, SECRET, transport=transport)
+        for i in range(args.requests):
+            report.timed(users.get_user, 'user%d' % (i % 100))
+            report.timed(muc.get_room, 'room%d' % (i % 100))
+            report.timed(system.get_prop, 'bench.prop%d' % (i % 100))
+
+
+def provision(args):
+    """
+    Bulk creation of users with group memberships
+    """
+    with Scenario('provision', args, groups=10) as (url, transport, report):
+        users = Users(url, SECRET, transport=transport)
+        specs = ({'username': 'new%d' % i, 'password': 'pw', 'name': 'New %d' % i,
+                  'groups': ['group%d' % (i % 10)]} for i in range(args.requests))
+        last = time.perf_counter()
+        for result in add_users(users, specs, workers=args.workers):
+            now = time.perf_counter()
+            report.add(now - last, result.error is not None)
+            last = now
+        report.extra['users'] = args.requests
+        report.extra['note'] = 'latency is the interval between completions, each user is 2 requests'
+
+
+def decode(args):
+    """
+    Decoding of a large user list, buffered and streamed into records
+    """
+    with Scenario('decode', args, users=args.users) as (url, transport, report):
+        metrics = Metrics()
+        codec = get_codec(args.codec)
+        users = Users(url, SECRET, transport=transport, codec=codec, hooks=[metrics])
+        records = Users(url, SECRET, transport=transport, records=True)
+        start = time.perf_counter()
+        report.timed(users.get_users)
+        report.extra['get_users'] = '%.1f ms, %.1f ms decoding with %s' % (
+            (time.perf_counter() - start) * 1000, metrics.snapshot()['GET /users']['decode'] * 1000, codec.name)
+        start = time.perf_counter()
+        report.timed(lambda: sum(1 for _ in records.iter_users()))
+        report.extra['iter_users(records)'] = '%.1f ms' % ((time.perf_counter() - start) * 1000)
+        report.extra['users'] = args.users
+
+
+def mixed(args):
+    """
+    Concurrent threads issuing a mix of reads and writes
+    """
+    with Scenario('mixed', args, users=1000, groups=20, rooms=200, sessions=500, props=100) as (url, transport, report):
+        clients = {
+            'users': Users(url, SECRET, transport=transport),
+            'muc': Muc(url, SECRET, transport=transport),
+            'system': System(url, SECRET, transport=transport),
+            'groups': Groups(url, SECRET, transport=transport),
+            'sessions': Sessions(url, SECRET, transport=transport),
+            'messages': Messages(url, SECRET, transport=transport),
+        }
+        operations = [
+            (30, lambda rnd: clients['users'].get_user('user%d' % rnd.randrange(1000))),
+            (20, lambda rnd: clients['muc'].get_room('room%d' % rnd.randrange(200))),
+            (15, lambda rnd: clients['system'].get_prop('bench.prop%d' % rnd.randrange(100))),
+            (10, lambda rnd: clients['messages'].get_unread_messages('user%d@example.org' % rnd.randrange(1000))),
+            (8, lambda rnd: clients['system'].update_prop('bench.prop%d' % rnd.randrange(100), 'x')),
+            (8, lambda rnd: clients['users'].update_user('user%d' % rnd.randrange(1000), name='Renamed')),
+            (5, lambda rnd: clients['groups'].get_group('group%d' % rnd.randrange(20))),
+            (4, lambda rnd: clients['sessions'].get_user_sessions('user%d' % rnd.randrange(1000))),
+        ]
+        weights = [weight for weight, _ in operations]
+        # The first threads take one request more when the requests do not divide evenly
+        counts = [args.requests // args.workers + (1 if i < args.requests % args.workers else 0)
+                  for i in range(args.workers)]
+
+        def work(seed):
+            rnd = random.Random(seed)
+            for _ in range(counts[seed]):
+                operation = rnd.choices(operations, weights)[0][1]
+                report.timed(operation, rnd)
+
+        threads = [threading.Thread(target=work, args=(i,)) for i in range(args.workers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        report.extra['threads'] = args.workers
+
+
+SCENARIOS = {
+    'latency': latency,
+    'provision': provision,
+    'decode': decode,
+    'mixed': mixed,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('scenarios', nargs='*', metavar='scenario',
+                        help='any of %s. Default: all' % ', '.join(sorted(SCENARIOS)))
+    parser.add_argument('--requests', type=int, default=1000, help='requests (or users) per scenario')
+    parser.add_argument('--workers', type=int, default=16, help='concurrent threads')
+    parser.add_argument('--users', type=int, default=20000, help='size of the list in the decode scenario')
+    parser.add_argument('--latency', type=float, default=0.0, help='server latency in seconds')
+    parser.add_argument('--jitter', type=float, default=0.0, help='maximum random extra server latency')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='fraction of injected 503 errors')
+    parser.add_argument('--codec', choices=('orjson', 'ujson', 'json'), default=None,
+                        help='JSON codec of the decode scenario. Default: the fastest installed')
+    parser.add_argument('--trace-memory', action='store_true', help='report peak Python allocations')
+    args = parser.parse_args()
+    unknown = set(args.scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error('unknown scenario: %s' % ', '.join(sorted(unknown)))
+    for name in args.scenarios or ['latency', 'provision', 'decode', 'mixed']:
+        # A process per scenario, so peak memory is not carried over from earlier scenarios
+        process = multiprocessing.Process(target=SCENARIOS[name], args=(args,))
+        process.start()
+        process.join()
+        if process.exitcode:
+            sys.exit(process.exitcode)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,504 @@
+# -*- coding: utf-8 -*-
+"""
+Local stand-in for the Openfire REST API plugin
+
+Implements the `/plugins/restapi/v1/` endpoints used by the client classes
+with in-memory state, plus configurable latency and error injection. It is
+meant for benchmarks, not for checking protocol details.
+
+    python benchmarks/server.py --port 9090 --users 10000 --latency 0.002
+"""
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlsplit
+
+PREFIX = '/plugins/restapi/v1'
+
+
+class NotFound(Exception):
+
+    def __init__(self, exception, message):
+        super(NotFound, self).__init__(message)
+        self.exception = exception
+
+
+class Conflict(NotFound):
+    pass
+
+
+def _wrap(key, values):
+    return {key: values}
+
+
+def _unwrap(value, key):
+    if isinstance(value, dict):
+        value = value.get(key)
+    if value is None:
+        return []
+    return value if isinstance(value, list) else [value]
+
+
+class State(object):
+    """
+    In-memory data of the fake server
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.users = {}
+        self.user_groups = {}
+        self.rosters = {}
+        self.lockouts = set()
+        self.groups = {}
+        self.rooms = {}
+        self.sessions = []
+        self.props = {}
+        self.unread = {}
+        self.broadcasts = 0
+
+    def populate(self, users=0, groups=0, rooms=0, sessions=0, props=0, seed=0):
+        """
+        Fill the state with generated entities
+
+        :param users: (optional) Number of users
+        :param groups: (optional) Number of groups. Users are spread over them
+        :param rooms: (optional) Number of chat rooms in the `conference` service
+        :param sessions: (optional) Number of sessions of random users
+        :param props: (optional) Number of system properties
+        :param seed: (optional) Random seed
+        """
+        rnd = random.Random(seed)
+        for i in range(users):
+            username = 'user%d' % i
+            self.users[username] = {
+                'username': username,
+                'name': 'User %d' % i,
+                'email': '%s@example.org' % username,
+                'properties': {'property': [{'@key': 'department', '@value': 'dept%d' % (i % 50)}]},
+            }
+            self.unread[username] = rnd.randint(0, 20)
+        for i in range(groups):
+            members = ['user%d' % j for j in range(i, users, groups)]
+            self.groups['group%d' % i] = {'name': 'group%d' % i, 'description': 'Group %d' % i, 'admins': [],
+                                          'members': members}
+            for member in members:
+                self.user_groups.setdefault(member, set()).add('group%d' % i)
+        service = self.rooms.setdefault('conference', {})
+        for i in range(rooms):
+            service['room%d' % i] = self._room({'roomName': 'room%d' % i, 'naturalName': 'Room %d' % i,
+                                                'description': 'Generated room', 'maxUsers': 30,
+                                                'persistent': True, 'publicRoom': True,
+                                                'owners': {'owner': ['admin@example.org']},
+                                                'members': {'member': ['user%d@example.org' % j
+                                                                       for j in range(i % 10)]}})
+        for i in range(sessions):
+            username = 'user%d' % rnd.randrange(max(users, 1))
+            self.sessions.append({
+                'sessionId': '%s@example.org/res%d' % (username, i),
+                'username': username,
+                'resource': 'res%d' % i,
+                'node': 'Local',
+                'sessionStatus': 'Authenticated',
+                'presenceStatus': rnd.choice(['Online', 'Away', 'Do Not Disturb']),
+                'priority': 0,
+                'hostAddress': '10.0.%d.%d' % (i // 250 % 250, i % 250),
+                'hostName': 'host%d.example.org' % (i % 100),
+                'creationDate': '2024-01-01T00:00:00+00:00',
+                'lastActionDate': '2024-01-01T00:00:00+00:00',
+                'secure': True,
+            })
+        for i in range(props):
+            self.props['bench.prop%d' % i] = str(i)
+
+    @staticmethod
+    def _room(payload):
+        room = dict((key, value) for key, value in payload.items() if value is not None)
+        for key, inner in (('owners', 'owner'), ('admins', 'admin'), ('members', 'member'),
+                           ('outcasts', 'outcast'), ('broadcastPresenceRoles', 'broadcastPresenceRole')):
+            room[key] = _unwrap(payload.get(key), inner)
+        return room
+
+    @staticmethod
+    def _render_room(room):
+        room = dict(room)
+        for key, inner in (('owners', 'owner'), ('admins', 'admin'), ('members', 'member'),
+                           ('outcasts', 'outcast'), ('broadcastPresenceRoles', 'broadcastPresenceRole')):
+            room[key] = _wrap(inner, room[key])
+        return room
+
+    def _user(self, username):
+        if username not in self.users:
+            raise NotFound('UserNotFoundException', 'User %s not found' % username)
+        return self.users[username]
+
+    def _service(self, query):
+        return self.rooms.setdefault(query.get('servicename', 'conference'), {})
+
+    def _get_room(self, query, roomname):
+        service = self._service(query)
+        if roomname not in service:
+            raise NotFound('RoomNotFoundException', 'Chat room %s not found' % roomname)
+        return service[roomname]
+
+    # Handlers return (status, JSON object or None)
+
+    def get_users(self, query, body):
+        search = query.get('search')
+        users = [user for name, user in self.users.items() if not search or search in name]
+        return 200, _wrap('users', users)
+
+    def get_user(self, query, body, username):
+        return 200, self._user(username)
+
+    def add_user(self, query, body):
+        if body['username'] in self.users:
+            raise Conflict('UserAlreadyExistsException', 'User %s exists' % body['username'])
+        self.users[body['username']] = dict((key, value) for key, value in body.items()
+                                            if key != 'password' and value is not None)
+        return 201, None
+
+    def update_user(self, query, body, username):
+        user = self._user(username)
+        user.update((key, value) for key, value in body.items() if key != 'password' and value is not None)
+        return 200, None
+
+    def delete_user(self, query, body, username):
+        self._user(username)
+        del self.users[username]
+        return 200, None
+
+    def get_user_groups(self, query, body, username):
+        self._user(username)
+        return 200, _wrap('groupname', sorted(self.user_groups.get(username, ())))
+
+    def add_user_groups(self, query, body, username):
+        self._user(username)
+        for groupname in _unwrap(body, 'groupname'):
+            self.user_groups.setdefault(username, set()).add(groupname)
+            group = self.groups.get(groupname)
+            if group is not None and username not in group['members']:
+                group['members'].append(username)
+        return 201, None
+
+    def delete_user_groups(self, query, body, username):
+        self._user(username)
+        for groupname in _unwrap(body, 'groupname'):
+            self.user_groups.get(username, set()).discard(groupname)
+            group = self.groups.get(groupname)
+            if group is not None and username in group['members']:
+                group['members'].remove(username)
+        return 200, None
+
+    def lock_user(self, query, body, username):
+        self._user(username)
+        self.lockouts.add(username)
+        return 201, None
+
+    def unlock_user(self, query, body, username):
+        self.lockouts.discard(username)
+        return 200, None
+
+    def get_roster(self, query, body, username):
+        self._user(username)
+        return 200, _wrap('rosterItem', list(self.rosters.get(username, {}).values()))
+
+    def add_roster_item(self, query, body, username):
+        self._user(username)
+        self.rosters.setdefault(username, {})[body['jid']] = body
+        return 201, None
+
+    def update_roster_item(self, query, body, username, jid):
+        self._user(username)
+        self.rosters.setdefault(username, {})[jid] = body
+        return 200, None
+
+    def delete_roster_item(self, query, body, username, jid):
+        self.rosters.get(username, {}).pop(jid, None)
+        return 200, None
+
+    def get_groups(self, query, body):
+        return 200, _wrap('groups', [self._render_group(group) for group in self.groups.values()])
+
+    @staticmethod
+    def _render_group(group):
+        return dict(group, admins=_wrap('admin', group['admins']), members=_wrap('member', group['members']))
+
+    def get_group(self, query, body, groupname):
+        if groupname not in self.groups:
+            raise NotFound('GroupNotFoundException', 'Group %s not found' % groupname)
+        return 200, self._render_group(self.groups[groupname])
+
+    def add_group(self, query, body):
+        if body['name'] in self.groups:
+            raise Conflict('GroupAlreadyExistsException', 'Group %s exists' % body['name'])
+        self.groups[body['name']] = {'name': body['name'], 'description': body.get('description'),
+                                     'admins': [], 'members': []}
+        return 201, None
+
+    def update_group(self, query, body, groupname):
+        self.get_group(query, body, groupname)
+        self.groups[groupname]['description'] = body.get('description')
+        return 200, None
+
+    def delete_group(self, query, body, groupname):
+        self.get_group(query, body, groupname)
+        del self.groups[groupname]
+        return 200, None
+
+    def get_rooms(self, query, body):
+        search = query.get('search')
+        rooms = [self._render_room(room) for name, room in self._service(query).items()
+                 if not search or search in name]
+        return 200, _wrap('chatRooms', rooms)
+
+    def get_room(self, query, body, roomname):
+        return 200, self._render_room(self._get_room(query, roomname))
+
+    def get_room_users(self, query, body, roomname):
+        self._get_room(query, roomname)
+        return 200, _wrap('participants', [])
+
+    def add_room(self, query, body):
+        service = self._service(query)
+        if body['roomName'] in service:
+            raise Conflict('AlreadyExistsException', 'Chat room %s exists' % body['roomName'])
+        service[body['roomName']] = self._room(body)
+        return 201, None
+
+    def update_room(self, query, body, roomname):
+        self._get_room(query, roomname)
+        self._service(query)[roomname] = self._room(body)
+        return 200, None
+
+    def delete_room(self, query, body, roomname):
+        self._get_room(query, roomname)
+        del self._service(query)[roomname]
+        return 200, None
+
+    def grant_role(self, query, body, roomname, role, username):
+        room = self._get_room(query, roomname)
+        for key in ('owners', 'admins', 'members', 'outcasts'):
+            if username in room[key]:
+                room[key].remove(username)
+        room[role].append(username)
+        return 201, None
+
+    def revoke_role(self, query, body, roomname, role, username):
+        room = self._get_room(query, roomname)
+        if username in room[role]:
+            room[role].remove(username)
+        return 200, None
+
+    def get_sessions(self, query, body):
+        return 200, _wrap('sessions', self.sessions)
+
+    def get_user_sessions(self, query, body, username):
+        return 200, _wrap('sessions', [session for session in self.sessions if session['username'] == username])
+
+    def close_user_sessions(self, query, body, username):
+        self.sessions = [session for session in self.sessions if session['username'] != username]
+        return 200, None
+
+    def get_props(self, query, body):
+        return 200, _wrap('property', [{'@key': key, '@value': value} for key, value in self.props.items()])
+
+    def get_prop(self, query, body, key):
+        if key not in self.props:
+            raise NotFound('PropertyNotFoundException', 'Property %s not found' % key)
+        return 200, {'@key': key, '@value': self.props[key]}
+
+    def update_prop(self, query, body):
+        self.props[body['@key']] = body['@value']
+        return 201, None
+
+    def delete_prop(self, query, body, key):
+        self.get_prop(query, body, key)
+        del self.props[key]
+        return 200, None
+
+    def get_concurrent_sessions(self, query, body):
+        return 200, {'clusterSessions': len(self.sessions), 'localSessions': len(self.sessions)}
+
+    def send_broadcast(self, query, body):
+        self.broadcasts += 1
+        return 201, None
+
+    def get_unread(self, query, body, jid):
+        return 200, {'count': self.unread.get(jid.partition('@')[0], 0)}
+
+
+ROUTES = [(method, re.compile('^' + PREFIX + pattern + '$'), handler) for method, pattern, handler in (
+    ('GET', '/users', 'get_users'),
+    ('POST', '/users', 'add_user'),
+    ('GET', '/users/([^/]+)', 'get_user'),
+    ('PUT', '/users/([^/]+)', 'update_user'),
+    ('DELETE', '/users/([^/]+)', 'delete_user'),
+    ('GET', '/users/([^/]+)/groups', 'get_user_groups'),
+    ('POST', '/users/([^/]+)/groups', 'add_user_groups'),
+    ('DELETE', '/users/([^/]+)/groups', 'delete_user_groups'),
+    ('GET', '/users/([^/]+)/roster', 'get_roster'),
+    ('POST', '/users/([^/]+)/roster', 'add_roster_item'),
+    ('PUT', '/users/([^/]+)/roster/([^/]+)', 'update_roster_item'),
+    ('DELETE', '/users/([^/]+)/roster/([^/]+)', 'delete_roster_item'),
+    ('POST', '/lockouts/([^/]+)', 'lock_user'),
+    ('DELETE', '/lockouts/([^/]+)', 'unlock_user'),
+    ('GET', '/groups', 'get_groups'),
+    ('POST', '/groups', 'add_group'),
+    ('GET', '/groups/([^/]+)', 'get_group'),
+    ('PUT', '/groups/([^/]+)', 'update_group'),
+    ('DELETE', '/groups/([^/]+)', 'delete_group'),
+    ('GET', '/chatrooms', 'get_rooms'),
+    ('POST', '/chatrooms', 'add_room'),
+    ('GET', '/chatrooms/([^/]+)', 'get_room'),
+    ('PUT', '/chatrooms/([^/]+)', 'update_room'),
+    ('DELETE', '/chatrooms/([^/]+)', 'delete_room'),
+    ('GET', '/chatrooms/([^/]+)/participants', 'get_room_users'),
+    ('POST', '/chatrooms/([^/]+)/(owners|admins|members|outcasts)/([^/]+)', 'grant_role'),
+    ('DELETE', '/chatrooms/([^/]+)/(owners|admins|members|outcasts)/([^/]+)', 'revoke_role'),
+    ('GET', '/sessions', 'get_sessions'),
+    ('GET', '/sessions/([^/]+)', 'get_user_sessions'),
+    ('DELETE', '/sessions/([^/]+)', 'close_user_sessions'),
+    ('GET', '/system/properties', 'get_props'),
+    ('POST', '/system/properties', 'update_prop'),
+    ('GET', '/system/properties/([^/]+)', 'get_prop'),
+    ('DELETE', '/system/properties/([^/]+)', 'delete_prop'),
+    ('GET', '/system/statistics/sessions', 'get_concurrent_sessions'),
+    ('POST', '/messages/users', 'send_broadcast'),
+    ('GET', '/archive/messages/unread/([^/]+)', 'get_unread'),
+)]
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+
+    def _handle(self):
+        server = self.server
+        length = int(self.headers.get('Content-Length') or 0)
+        raw = self.rfile.read(length) if length else b''
+        with server.state.lock:
+            server.count += 1
+        delay = server.latency + (server.random.uniform(0, server.jitter) if server.jitter else 0.0)
+        if delay:
+            time.sleep(delay)
+        if server.error_rate and server.random.random() < server.error_rate:
+            return self._send(server.error_status, None)
+        if server.secret is not None and self.headers.get('Authorization') != server.secret:
+            return self._send(401, {'exception': 'RequestNotAuthorised', 'message': 'Bad secret'})
+        url = urlsplit(self.path)
+        query = dict((key, values[-1]) for key, values in parse_qs(url.query).items())
+        for method, pattern, name in ROUTES:
+            match = pattern.match(url.path)
+            if match and method == self.command:
+                break
+        else:
+            return self._send(404, {'exception': 'IllegalArgumentException', 'message': 'No route'})
+        try:
+            body = json.loads(raw.decode('utf-8')) if raw else None
+            with server.state.lock:
+                status, result = getattr(server.state, name)(query, body, *[unquote(arg) for arg in match.groups()])
+        except Conflict as e:
+            return self._send(409, {'exception': e.exception, 'message': str(e)})
+        except NotFound as e:
+            return self._send(404, {'exception': e.exception, 'message': str(e)})
+        self._send(status, result)
+
+    do_GET = do_POST = do_PUT = do_DELETE = _handle
+
+    def _send(self, status, result):
+        out = json.dumps(result).encode('utf-8') if result is not None else b''
+        self.send_response(status)
+        if out:
+            self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(out)))
+        self.end_headers()
+        self.wfile.write(out)
+
+    def log_message(self, *args):
+        pass
+
+
+class FakeOpenfire(ThreadingHTTPServer):
+    """
+    Threaded fake server. Every request sleeps `latency` plus up to `jitter`
+    seconds, and fails with `error_status` at `error_rate`.
+    """
+    daemon_threads = True
+    request_queue_size = 1024
+
+    def __init__(self, host='127.0.0.1', port=0, secret=None, latency=0.0, jitter=0.0,
+                 error_rate=0.0, error_status=503, seed=0):
+        """
+        :param host: (optional) Address to listen on. Default: 127.0.0.1
+        :param port: (optional) Port to listen on. Default: 0 (any free port)
+        :param secret: (optional) Expected shared secret. Default: None (any)
+        :param latency: (optional) Seconds added to every request. Default: 0.0
+        :param jitter: (optional) Maximum random seconds added on top of `latency`. Default: 0.0
+        :param error_rate: (optional) Fraction of requests failing with `error_status`. Default: 0.0
+        :param error_status: (optional) HTTP status of injected errors. Default: 503
+        :param seed: (optional) Random seed of jitter and errors. Default: 0
+        """
+        ThreadingHTTPServer.__init__(self, (host, port), Handler)
+        self.secret = secret
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.random = random.Random(seed)
+        self.state = State()
+        self.count = 0
+        self._thread = None
+
+    @property
+    def url(self):
+        return 'http://%s:%d' % self.server_address[:2]
+
+    def start(self):
+        """
+        Serve from a background thread
+
+        :return: Base URL of the server
+        """
+        self._thread = threading.Thread(target=self.serve_forever, name='fake-openfire')
+        self._thread.daemon = True
+        self._thread.start()
+        return self.url
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=9090)
+    parser.add_argument('--secret', default=None)
+    parser.add_argument('--latency', type=float, default=0.0, help='seconds added to every request')
+    parser.add_argument('--jitter', type=float, default=0.0, help='maximum random extra seconds')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='fraction of failing requests')
+    parser.add_argument('--error-status', type=int, default=503)
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--groups', type=int, default=20)
+    parser.add_argument('--rooms', type=int, default=200)
+    parser.add_argument('--sessions', type=int, default=500)
+    parser.add_argument('--props', type=int, default=100)
+    args = parser.parse_args()
+    server = FakeOpenfire(args.host, args.port, secret=args.secret, latency=args.latency, jitter=args.jitter,
+                          error_rate=args.error_rate, error_status=args.error_status)
+    server.state.populate(users=args.users, groups=args.groups, rooms=args.rooms, sessions=args.sessions,
+                          props=args.props)
+    print('Serving on %s%s' % (server.url, PREFIX))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -1,10 +1,30 @@
 # -*- coding: utf-8 -*-
+import importlib
 
 __version__ = '0.1.1'
 
-from users import Users
-from muc import Muc
-from system import System
-from groups import Groups
-from sessions import Sessions
-from messages import Messages
+# Endpoint classes are imported on first access, so that `import ofrestapi`
+# does not load the HTTP stack
+_CLASSES = {
+    'Users': 'users',
+    'Muc': 'muc',
+    'System': 'system',
+    'Groups': 'groups',
+    'Sessions': 'sessions',
+    'Messages': 'messages',
+}
+
+__all__ = ['Users', 'Muc', 'System', 'Groups', 'Sessions', 'Messages']
+
+
+def __getattr__(name):
+    module = _CLASSES.get(name)
+    if module is None:
+        raise AttributeError('module %r has no attribute %r' % (__name__, name))
+    value = getattr(importlib.import_module('.' + module, __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_CLASSES))
@@ -0,0 +1,501 @@
+# -*- coding: utf-8 -*-
+import asyncio
+import threading
+import weakref
+from time import perf_counter
+
+import httpx
+
+from .base import Base
+from .bulk import BulkResult, RateLimiter
+from .exception import InvalidResponseException
+from .streaming import ItemParser
+from .users import Users
+from .muc import Muc
+from .system import System
+from .groups import Groups
+from .sessions import Sessions
+from .messages import Messages, BroadcastQueue
+from .properties import PropertyMirror
+
+
+class AsyncTransport(object):
+    """
+    Pooled asyncio HTTP transport shared by async API clients
+
+    Connections belong to an event loop, so every event loop using the
+    transport gets its own pool, created on its first request. A pool is
+    dropped with its event loop.
+    """
+    _shared = {}
+    _shared_lock = threading.Lock()
+    # Errors raised when the server could not be reached or did not answer
+    connection_errors = (httpx.TransportError,)
+
+    def __init__(self, max_connections=100, max_keepalive_connections=20, keepalive_expiry=5.0,
+                 connect_timeout=None, read_timeout=None):
+        """
+        :param max_connections: (optional) Maximum number of concurrent connections. Default: 100
+        :param max_keepalive_connections: (optional) Maximum number of idle connections kept open. Default: 20
+        :param keepalive_expiry: (optional) Seconds an idle connection is kept open. Default: 5.0
+        :param connect_timeout: (optional) Seconds to wait for a connection to be established. Default: None (no timeout)
+        :param read_timeout: (optional) Seconds to wait for the server to send a response. Default: None (no timeout)
+        """
+        self.max_connections = max_connections
+        self.max_keepalive_connections = max_keepalive_connections
+        self.keepalive_expiry = keepalive_expiry
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self._clients = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+
+    @property
+    def client(self):
+        """
+        `httpx.AsyncClient` of the running event loop
+        """
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            client = self._clients.get(loop)
+            if client is None:
+                client = self._clients[loop] = httpx.AsyncClient(
+                    limits=httpx.Limits(max_connections=self.max_connections,
+                                        max_keepalive_connections=self.max_keepalive_connections,
+                                        keepalive_expiry=self.keepalive_expiry),
+                    timeout=httpx.Timeout(None, connect=self.connect_timeout, read=self.read_timeout),
+                )
+            return client
+
+    @classmethod
+    def shared(cls, host, secret, **options):
+        """
+        Return the transport shared by all async clients of the host/secret pair
+
+        :param host: Scheme://Host/ for API requests
+        :param secret: Shared secret key for API requests
+        :param options: (optional) Pool options. Applied only when the transport is created
+        """
+        key = (host, secret)
+        with cls._shared_lock:
+            transport = cls._shared.get(key)
+            if transport is None:
+                transport = cls._shared[key] = cls(**options)
+            return transport
+
+    async def request(self, method, url, params=None, data=None, stream=False, timed=False, **kwargs):
+        """
+        Send a request through the pool
+
+        :param method: HTTP method. E.g. `GET`
+        :param url: Full URL for request
+        :param params: (optional) Query parameters. Parameters set to None are skipped
+        :param data: (optional) Bytes of the request body
+        :param stream: (optional) Return before the body is read. The caller must close the response. Default: False
+        :param timed: (optional) Store the seconds spent opening connections in `connect_time` of the response. Default: False
+        :param **kwargs: Arguments that `httpx.AsyncClient.request` takes
+        :return: `httpx.Response` object
+        """
+        if params:
+            params = dict((key, value) for key, value in params.items() if value is not None)
+        if timed:
+            timing = {'connect': 0.0, 'start': 0.0}
+
+            async def trace(event, info):
+                if event in ('connection.connect_tcp.started', 'connection.start_tls.started'):
+                    timing['start'] = perf_counter()
+                elif event in ('connection.connect_tcp.complete', 'connection.start_tls.complete'):
+                    timing['connect'] += perf_counter() - timing['start']
+            kwargs['extensions'] = {'trace': trace}
+        client = self.client
+        request = client.build_request(method, url, params=params, content=data, **kwargs)
+        r = await client.send(request, stream=stream)
+        if timed:
+            r.connect_time = timing['connect']
+        return r
+
+    @staticmethod
+    def body_sizes(response, stream=False):
+        """
+        Return the sizes of the request and response bodies in bytes
+
+        :param response: `httpx.Response` object
+        :param stream: (optional) The response body has not been read yet. Default: False
+        :return: Tuple of (sent, received)
+        """
+        return len(response.request.content), 0 if stream else len(response.content)
+
+    async def close(self):
+        """
+        Close the pooled connections of the running event loop
+        """
+        with self._lock:
+            client = self._clients.pop(asyncio.get_running_loop(), None)
+        if client is not None:
+            await client.aclose()
+
+
+async def run_bulk_async(func, items, workers=8, rate=None):
+    """
+    Await `func` for every item with bounded concurrency
+
+    Asyncio counterpart of `ofrestapi.bulk.run_bulk`.
+
+    :param func: Coroutine function taking one item. Returns a (status, result) or (status, result, error) tuple
+    :param items: Iterable of items
+    :param workers: (optional) Number of concurrent calls. Default: 8
+    :param rate: (optional) Maximum number of items started per second. Default: None (unlimited)
+    :return: Async generator of `BulkResult` in completion order
+    """
+    limiter = RateLimiter(rate) if rate else None
+
+    async def call(index, item):
+        try:
+            if limiter:
+                delay = limiter.reserve()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            outcome = await func(item)
+        except Exception as e:
+            return BulkResult(index, item, BulkResult.FAILED, error=e)
+        return BulkResult(index, item, *outcome)
+
+    pending = set()
+    try:
+        for index, item in enumerate(items):
+            pending.add(asyncio.ensure_future(call(index, item)))
+            if len(pending) >= workers:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    yield task.result()
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                yield task.result()
+    finally:
+        for task in pending:
+            task.cancel()
+
+
+class AsyncBroadcastQueue(BroadcastQueue):
+    """
+    Asyncio task coalescing bursts of broadcasts
+
+    `put` must be called from the event loop the broadcasts are sent from.
+    `flush` and `close` are coroutines.
+    """
+    _task = None
+    _wakeup = None
+    _idle = None
+
+    def put(self, message):
+        """
+        Queue a message without waiting for it to be sent
+
+        :param message: Message to be send
+        """
+        self._add(message)
+        if self._task is None:
+            self._wakeup = asyncio.Event()
+            self._idle = asyncio.Event()
+            self._task = asyncio.get_running_loop().create_task(self._run())
+        self._idle.clear()
+        self._wakeup.set()
+
+    async def _run(self):
+        while True:
+            if not self._pending:
+                self._busy = False
+                self._idle.set()
+                if self._closed:
+                    return
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+            self._busy = True
+            if self.window and not self._closed:
+                await asyncio.sleep(self.window)
+            if self._limiter:
+                delay = self._limiter.reserve()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            body = self._take()
+            try:
+                await self.messages.send_broadcast(body)
+            except Exception as e:
+                self._record(e)
+            else:
+                self._record()
+
+    async def flush(self, timeout=None):
+        """
+        Wait until all queued messages are sent
+
+        :param timeout: (optional) Maximum seconds to wait. Default: None (no timeout)
+        :return: True if the queue is empty
+        """
+        if self._task is None:
+            return True
+        try:
+            await asyncio.wait_for(self._idle.wait(), timeout)
+        except asyncio.TimeoutError:
+            return False
+        return True
+
+    async def close(self):
+        """
+        Send the queued messages and stop the sender
+        """
+        self._closed = True
+        if self._task is not None:
+            self._wakeup.set()
+            await self._task
+
+
+class AsyncPropertyMirror(PropertyMirror):
+    """
+    Local copy of all system properties, refreshed by an asyncio task
+
+    `start`, `stop` and `refresh` are coroutines.
+    """
+    _task = None
+
+    def __init__(self, system, interval=60.0):
+        """
+        :param system: `AsyncSystem` client
+        :param interval: (optional) Seconds between refreshes. None disables the background refresh. Default: 60.0
+        """
+        super(AsyncPropertyMirror, self).__init__(system, interval=interval, start=False)
+
+    async def start(self):
+        """
+        Load the properties and start the background refresh
+        """
+        await self.refresh()
+        if self.interval and self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        """
+        Stop the background refresh
+        """
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.refresh()
+            except Exception as e:
+                self._record(e)
+
+    async def refresh(self):
+        """
+        Reload all properties now
+
+        :return: Dictionary of the changed keys mapped to (old, new) values. None stands for a missing property
+        """
+        since = self._seq
+        return self._update(await self.system.get_props(), since)
+
+
+class AsyncBase(Base):
+    transport_class = AsyncTransport
+
+    async def _request(self, method, endpoint, headers=None, info=None, **kwargs):
+        """
+        Send a request through the transport, retrying it as the retry policy allows
+
+        :param headers: (optional) Extra headers for this request
+        :param info: (optional) `RequestInfo` receiving status, sizes and timings
+        :return: Response object of the transport
+        """
+        url = self.host + endpoint
+        headers = self._request_headers(headers, kwargs)
+        if info is not None:
+            kwargs['timed'] = True
+            start = perf_counter()
+        attempt = 0
+        while True:
+            budget = self.throttle.budget(method) if self.throttle is not None else None
+            try:
+                if self.breaker is not None:
+                    self.breaker.before()
+                if budget is not None:
+                    waited = await budget.acquire_async()
+                    if info is not None:
+                        info.queued += waited
+            except Exception as e:
+                # Failed fast without being sent
+                if info is not None:
+                    info.attempts = attempt
+                    self._finish_request(info, e)
+                raise
+            try:
+                try:
+                    r = await self.transport.request(method, url, headers=headers, **kwargs)
+                finally:
+                    # Also on cancellation, which is not an `Exception`
+                    if budget is not None:
+                        budget.release()
+            except Exception as e:
+                if self.breaker is not None:
+                    self.breaker.failure()
+                if (not isinstance(e, self.transport.connection_errors) or
+                        self.retry is None or not self.retry.allows(method, attempt)):
+                    if info is not None:
+                        info.attempts = attempt + 1
+                        self._finish_request(info, e)
+                    raise
+                delay = self.retry.delay(attempt)
+            else:
+                if self.breaker is not None:
+                    self.breaker.record(r.status_code)
+                if (self.retry is None or r.status_code not in self.retry.statuses or
+                        not self.retry.allows(method, attempt)):
+                    if info is not None:
+                        info.attempts = attempt + 1
+                        info.measure(r, perf_counter() - start - info.queued, self.transport, kwargs.get('stream'))
+                    return r
+                delay = self.retry.delay(attempt, r)
+                await r.aclose()
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    async def _send_request(self, method, endpoint, info=None, **kwargs):
+        """
+        Send a request and parse the response
+        """
+        return self._parse_response(await self._request(method, endpoint, info=info, **kwargs), info)
+
+    async def _cached_request(self, method, endpoint, info=None, **kwargs):
+        """
+        Serve GET requests from the cache and invalidate it on writes
+        """
+        if method != 'GET':
+            try:
+                return await self._send_request(method, endpoint, info=info, **kwargs)
+            finally:
+                self.cache.invalidate(self.host, endpoint)
+        key = self.cache.make_key(self.headers['Authorization'], self.host, endpoint, kwargs.get('params'))
+        fresh, cached, validators = self.cache.get(key)
+        if fresh:
+            if info is not None:
+                info.cached = True
+                self._finish_request(info)
+            return cached
+        generation = self.cache.generation
+        r = await self._request(method, endpoint, headers=validators, info=info, **kwargs)
+        return self._store_response(key, r, cached, validators, generation, info)
+
+    async def _to_record(self, result, record):
+        return record(await result)
+
+    async def _coalesce(self, key, func):
+        return await self.single_flight.call_async(key, func)
+
+    async def _enqueue(self, method, endpoint, template, kwargs):
+        return Base._enqueue(self, method, endpoint, template, kwargs)
+
+    async def _iter_request(self, method, endpoint, record=None, template=None, chunk_size=65536, **kwargs):
+        """
+        Send a request and yield the records of the list response one at a time
+
+        The body is streamed and parsed incrementally, the cache is bypassed.
+
+        :param method: HTTP method for request. E.g. `GET`
+        :param endpoint: Plugin endpoint for request
+        :param record: (optional) Function building a typed record from each item. Used when `records` is enabled
+        :param template: (optional) Endpoint template reported to hooks. E.g. `/users`
+        :param chunk_size: (optional) Number of bytes read at once. Default: 65536
+        :param **kwargs: Arguments that request takes
+        :return: Async generator of JSON objects
+        """
+        if record is None or not self.records:
+            record = None
+        info = self._start_request(method, endpoint, template) if self.hooks else None
+        r = await self._request(method, endpoint, stream=True, info=info, **kwargs)
+        received = 0
+        decode = 0.0
+        error = None
+        try:
+            if r.status_code != 200:
+                await r.aread()
+                self._parse_response(r, info)
+                return
+            parser = ItemParser()
+            async for chunk in r.aiter_bytes(chunk_size):
+                received += len(chunk)
+                start = perf_counter()
+                items = parser.feed(chunk)
+                decode += perf_counter() - start
+                for item in items:
+                    yield record(item) if record is not None else item
+            if not parser.done:
+                raise InvalidResponseException('Incomplete response')
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            await r.aclose()
+            if info is not None and info.elapsed is None:
+                info.received = received
+                info.decode = decode
+                self._finish_request(info, error)
+
+
+class AsyncUsers(Users, AsyncBase):
+    pass
+
+
+class AsyncMuc(Muc, AsyncBase):
+    pass
+
+
+class AsyncSystem(System, AsyncBase):
+
+    async def _mirror_write(self, result, key, value):
+        result = await result
+        if self.mirror is not None:
+            self.mirror._written(key, value)
+        return result
+
+
+class AsyncGroups(Groups, AsyncBase):
+    pass
+
+
+class AsyncSessions(Sessions, AsyncBase):
+    pass
+
+
+class AsyncMessages(Messages, AsyncBase):
+    broadcast_queue_class = AsyncBroadcastQueue
+
+    async def send_broadcast(self, message, queued=False):
+        """
+        Send a broadcast/server message to all online users
+
+        :param message: Message to be send
+        :param queued: (optional) Return at once and send the message from `broadcasts`, coalesced with other queued messages. Default: False
+        """
+        result = Messages.send_broadcast(self, message, queued=queued)
+        return result if queued else await result
+
+    def iter_unread_messages(self, jids, workers=8, rate=None):
+        """
+        Retrieve unread messages counts of many JIDs concurrently
+
+        :param jids: Iterable of JIDs
+        :param workers: (optional) Number of concurrent requests. Default: 8
+        :param rate: (optional) Maximum number of requests started per second. Default: None (unlimited)
+        :return: Async generator of `BulkResult` whose items are the JIDs, in completion order
+        """
+        async def count(jid):
+            return BulkResult.OK, await self.get_unread_messages(jid)
+        return run_bulk_async(count, jids, workers=workers, rate=rate)
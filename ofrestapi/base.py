@@ -1,9 +1,15 @@
 # -*- coding: utf-8 -*-
-from exception import (IllegalArgumentException, UserNotFoundException, UserAlreadyExistsException,
+import time
+from time import perf_counter
+
+from .exception import (IllegalArgumentException, UserNotFoundException, UserAlreadyExistsException,
                        RequestNotAuthorisedException, UserServiceDisabledException,
                        SharedGroupException, InvalidResponseException, PropertyNotFoundException,
                        GroupAlreadyExistsException, GroupNotFoundException, RoomNotFoundException,
                        NotAllowedException, AlreadyExistsException)
+from .streaming import ItemParser
+from .codec import get_codec
+from .instrument import RequestInfo
 
 
 EXCEPTIONS_MAP = {
@@ -23,42 +29,300 @@ EXCEPTIONS_MAP = {
 
 
 class Base(object):
+    # Class of the shared default transport. None selects `ofrestapi.transport.Transport`,
+    # which loads `requests` only when the first client is created
+    transport_class = None
+    JSON_CONTENT = {'Content-Type': 'application/json'}
 
-    def __init__(self, host, secret, endpoint):
+    def __init__(self, host, secret, endpoint, transport=None, cache=None, records=False,
+                 retry=None, breaker=None, hooks=None, throttle=None, codec=None,
+                 outbox=None, single_flight=None):
         """
         :param host: Scheme://Host/ for API requests
         :param secret: Shared secret key for API requests
         :param endpoint: Endpoint for API requests
+        :param transport: (optional) `Transport` with the connection pool. Default: the pool shared by all clients of this host/secret
+        :param cache: (optional) `Cache` for GET results. Share one cache between clients to share results and invalidations. Default: None (no caching)
+        :param records: (optional) Return typed records from `ofrestapi.records` instead of JSON objects where available. Default: False
+        :param retry: (optional) `RetryPolicy` for failed requests. Default: None (no retries)
+        :param breaker: (optional) `CircuitBreaker` failing requests fast while the server is down. Share one between the clients of a host. Default: None
+        :param hooks: (optional) List of hooks from `ofrestapi.instrument` called before and after every request. Default: None
+        :param throttle: (optional) `Throttle` limiting request rate and concurrency. Share one between the clients of a host. Default: None
+        :param codec: (optional) `Codec` from `ofrestapi.codec` encoding request and decoding response bodies. Default: the first installed of orjson, ujson and json
+        :param outbox: (optional) `Outbox` queuing POST, PUT and DELETE requests durably and sending them in the background. Such calls return True once queued. Default: None
+        :param single_flight: (optional) `SingleFlight` sharing one request between identical concurrent GET calls. Share one between clients. Default: None
         """
         self.headers = {}
         self.headers['Authorization'] = secret
         self.headers['Accept'] = 'application/json'
         self.host = host
         self.endpoint = endpoint
+        self.transport = transport if transport else self._shared_transport(host, secret)
+        self.cache = cache
+        self.records = records
+        self.retry = retry
+        self.breaker = breaker
+        self.hooks = list(hooks) if hooks else []
+        self.throttle = throttle
+        self.codec = codec if codec is not None else get_codec()
+        self.outbox = outbox
+        if outbox is not None:
+            outbox.bind(self)
+        self.single_flight = single_flight
+
+    def _shared_transport(self, host, secret):
+        """
+        Return the transport shared by all clients of the host/secret pair
+        """
+        transport_class = self.transport_class
+        if transport_class is None:
+            from .transport import Transport as transport_class
+        return transport_class.shared(host, secret)
 
-    def _submit_request(self, func, endpoint, **kwargs):
+    def _submit_request(self, method, endpoint, record=None, template=None, **kwargs):
         """
         Wrapper for send a request
 
-        :param func: Name of the function for request
+        :param method: HTTP method for request. E.g. `GET`
+        :param endpoint: Plugin endpoint for request
+        :param record: (optional) Function building a typed record from the result. Used when `records` is enabled
+        :param template: (optional) Endpoint template reported to hooks. E.g. `/users/{username}`
+        :param **kwargs: Arguments that request takes
+        :return: JSON object or True
+        """
+        if self.outbox is not None and method != 'GET':
+            return self._enqueue(method, endpoint, template, kwargs)
+        if self.single_flight is not None and method == 'GET':
+            key = self.single_flight.make_key(self.headers['Authorization'], self.host, endpoint, kwargs.get('params'))
+            result = self._coalesce(key, lambda: self._dispatch_request(method, endpoint, template, kwargs))
+        else:
+            result = self._dispatch_request(method, endpoint, template, kwargs)
+        if record is not None and self.records:
+            return self._to_record(result, record)
+        return result
+
+    def _dispatch_request(self, method, endpoint, template, kwargs):
+        """
+        Send a request through the cache if there is one
+        """
+        info = self._start_request(method, endpoint, template) if self.hooks else None
+        if self.cache is not None:
+            return self._cached_request(method, endpoint, info=info, **kwargs)
+        return self._send_request(method, endpoint, info=info, **kwargs)
+
+    def _coalesce(self, key, func):
+        return self.single_flight.call(key, func)
+
+    def _to_record(self, result, record):
+        return record(result)
+
+    def _enqueue(self, method, endpoint, template, kwargs):
+        return self.outbox.append(self.host, method, endpoint, template, kwargs)
+
+    def _start_request(self, method, endpoint, template):
+        """
+        Create the `RequestInfo` of a request and call the `before_request` hooks
+        """
+        info = RequestInfo(method, template or endpoint, self.host + endpoint)
+        for hook in self.hooks:
+            hook.before_request(info)
+        return info
+
+    def _finish_request(self, info, error=None):
+        """
+        Complete the `RequestInfo` of a request and call the `after_request` hooks
+        """
+        info.error = error
+        info.elapsed = perf_counter() - info.start
+        for hook in self.hooks:
+            hook.after_request(info)
+
+    def _request(self, method, endpoint, headers=None, info=None, **kwargs):
+        """
+        Send a request through the transport, retrying it as the retry policy allows
+
+        :param headers: (optional) Extra headers for this request
+        :param info: (optional) `RequestInfo` receiving status, sizes and timings
+        :return: Response object of the transport
+        """
+        url = self.host + endpoint
+        headers = self._request_headers(headers, kwargs)
+        if info is not None:
+            kwargs['timed'] = True
+            start = perf_counter()
+        attempt = 0
+        while True:
+            budget = self.throttle.budget(method) if self.throttle is not None else None
+            try:
+                if self.breaker is not None:
+                    self.breaker.before()
+                if budget is not None:
+                    waited = budget.acquire()
+                    if info is not None:
+                        info.queued += waited
+            except Exception as e:
+                # Failed fast without being sent
+                if info is not None:
+                    info.attempts = attempt
+                    self._finish_request(info, e)
+                raise
+            try:
+                try:
+                    r = self.transport.request(method, url, headers=headers, **kwargs)
+                finally:
+                    # Also on cancellation, which is not an `Exception`
+                    if budget is not None:
+                        budget.release()
+            except Exception as e:
+                if self.breaker is not None:
+                    self.breaker.failure()
+                if (not isinstance(e, self.transport.connection_errors) or
+                        self.retry is None or not self.retry.allows(method, attempt)):
+                    if info is not None:
+                        info.attempts = attempt + 1
+                        self._finish_request(info, e)
+                    raise
+                delay = self.retry.delay(attempt)
+            else:
+                if self.breaker is not None:
+                    self.breaker.record(r.status_code)
+                if (self.retry is None or r.status_code not in self.retry.statuses or
+                        not self.retry.allows(method, attempt)):
+                    if info is not None:
+                        info.attempts = attempt + 1
+                        info.measure(r, perf_counter() - start - info.queued, self.transport, kwargs.get('stream'))
+                    return r
+                delay = self.retry.delay(attempt, r)
+                r.close()
+            time.sleep(delay)
+            attempt += 1
+
+    def _request_headers(self, headers, kwargs):
+        """
+        Merge the extra headers of a request and encode its `json` payload with the codec
+        """
+        if 'json' in kwargs:
+            kwargs['data'] = self.codec.encode(kwargs.pop('json'))
+            headers = dict(headers, **self.JSON_CONTENT) if headers else self.JSON_CONTENT
+        return dict(self.headers, **headers) if headers else self.headers
+
+    def _send_request(self, method, endpoint, info=None, **kwargs):
+        """
+        Send a request and parse the response
+        """
+        return self._parse_response(self._request(method, endpoint, info=info, **kwargs), info)
+
+    def _cached_request(self, method, endpoint, info=None, **kwargs):
+        """
+        Serve GET requests from the cache and invalidate it on writes
+        """
+        if method != 'GET':
+            try:
+                return self._send_request(method, endpoint, info=info, **kwargs)
+            finally:
+                self.cache.invalidate(self.host, endpoint)
+        key = self.cache.make_key(self.headers['Authorization'], self.host, endpoint, kwargs.get('params'))
+        fresh, cached, validators = self.cache.get(key)
+        if fresh:
+            if info is not None:
+                info.cached = True
+                self._finish_request(info)
+            return cached
+        generation = self.cache.generation
+        r = self._request(method, endpoint, headers=validators, info=info, **kwargs)
+        return self._store_response(key, r, cached, validators, generation, info)
+
+    def _store_response(self, key, r, cached, validators, generation, info=None):
+        """
+        Cache the result of a GET response. A `304 Not Modified` renews the cached result
+        """
+        if r.status_code == 304 and validators:
+            self.cache.set(key, cached, generation, self.cache.make_validators(r) or validators, revalidated=True)
+            if info is not None:
+                info.cached = True
+                self._finish_request(info)
+            return cached
+        result = self._parse_response(r, info)
+        self.cache.set(key, result, generation, self.cache.make_validators(r))
+        return result
+
+    def _iter_request(self, method, endpoint, record=None, template=None, chunk_size=65536, **kwargs):
+        """
+        Send a request and yield the records of the list response one at a time
+
+        The body is streamed and parsed incrementally, the cache is bypassed.
+
+        :param method: HTTP method for request. E.g. `GET`
         :param endpoint: Plugin endpoint for request
+        :param record: (optional) Function building a typed record from each item. Used when `records` is enabled
+        :param template: (optional) Endpoint template reported to hooks. E.g. `/users`
+        :param chunk_size: (optional) Number of bytes read at once. Default: 65536
         :param **kwargs: Arguments that request takes
+        :return: Generator of JSON objects
+        """
+        if record is None or not self.records:
+            record = None
+        info = self._start_request(method, endpoint, template) if self.hooks else None
+        r = self._request(method, endpoint, stream=True, info=info, **kwargs)
+        received = 0
+        decode = 0.0
+        error = None
+        try:
+            if r.status_code != 200:
+                self._parse_response(r, info)
+                return
+            parser = ItemParser()
+            for chunk in r.iter_content(chunk_size):
+                received += len(chunk)
+                start = perf_counter()
+                items = parser.feed(chunk)
+                decode += perf_counter() - start
+                for item in items:
+                    yield record(item) if record is not None else item
+            if not parser.done:
+                raise InvalidResponseException('Incomplete response')
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            r.close()
+            if info is not None and info.elapsed is None:
+                info.received = received
+                info.decode = decode
+                self._finish_request(info, error)
+
+    def _parse_response(self, r, info=None):
+        """
+        Turn a response into a result or an exception
+
+        :param r: Response object of the transport
+        :param info: (optional) `RequestInfo` receiving the decode time
         :return: JSON object or True
         """
-        r = func(
-            headers=self.headers,
-            url=self.host + endpoint,
-            **kwargs
-        )
+        if info is None:
+            return self._decode_response(r)
+        start = perf_counter()
+        try:
+            result = self._decode_response(r)
+        except Exception as e:
+            info.decode = perf_counter() - start
+            self._finish_request(info, e)
+            raise
+        info.decode = perf_counter() - start
+        self._finish_request(info)
+        return result
+
+    def _decode_response(self, r):
         if r.status_code in (200, 201):
             try:
-                return r.json()
+                return self.codec.decode(r.content)
             except:
                 return True
         else:
             try:
-                exception = r.json()['exception']
-                message = r.json()['message']
+                error = self.codec.decode(r.content)
+                exception = error['exception']
+                message = error['message']
             except:
                 raise InvalidResponseException(r.status_code)
             if exception in EXCEPTIONS_MAP:
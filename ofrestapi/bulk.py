@@ -0,0 +1,197 @@
+# -*- coding: utf-8 -*-
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from .exception import UserAlreadyExistsException
+from .snapshot import SessionSnapshot
+
+
+class BulkResult(object):
+    """
+    Outcome of one item of a bulk operation
+    """
+    __slots__ = ('index', 'item', 'status', 'result', 'error')
+
+    OK = 'ok'
+    CREATED = 'created'
+    EXISTS = 'exists'
+    # Done in part, e.g. a user exists but was not added to its groups
+    PARTIAL = 'partial'
+    FAILED = 'failed'
+
+    def __init__(self, index, item, status, result=None, error=None):
+        """
+        :param index: Position of the item in the input
+        :param item: The input item
+        :param status: One of OK, CREATED, EXISTS, PARTIAL, FAILED
+        :param result: (optional) Value returned by the API
+        :param error: (optional) Exception raised for a failed or partial item
+        """
+        self.index = index
+        self.item = item
+        self.status = status
+        self.result = result
+        self.error = error
+
+    def __repr__(self):
+        return '<BulkResult %d %s>' % (self.index, self.status)
+
+
+class RateLimiter(object):
+    """
+    Spread calls evenly so that no more than `rate` start per second
+    """
+
+    def __init__(self, rate):
+        """
+        :param rate: Maximum number of calls per second
+        """
+        self.interval = 1.0 / rate
+        self._next = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self):
+        """
+        Take the next slot and return the seconds until it starts
+        """
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next)
+            self._next = start + self.interval
+        return start - now
+
+    def wait(self):
+        """
+        Block until the next call is allowed
+        """
+        delay = self.reserve()
+        if delay > 0:
+            time.sleep(delay)
+
+
+def run_bulk(func, items, workers=8, rate=None):
+    """
+    Call `func` for every item with bounded concurrency
+
+    Items are consumed lazily, so `items` can be a generator of any length.
+    An exception raised for one item is reported in its result and does not
+    stop the others.
+
+    :param func: Callable taking one item. Returns a (status, result) or (status, result, error) tuple
+    :param items: Iterable of items
+    :param workers: (optional) Number of concurrent calls. Default: 8
+    :param rate: (optional) Maximum number of items started per second. Default: None (unlimited)
+    :return: Generator of `BulkResult` in completion order
+    """
+    limiter = RateLimiter(rate) if rate else None
+
+    def call(item):
+        if limiter:
+            limiter.wait()
+        return func(item)
+
+    def collect(future, index, item):
+        try:
+            outcome = future.result()
+        except Exception as e:
+            return BulkResult(index, item, BulkResult.FAILED, error=e)
+        return BulkResult(index, item, *outcome)
+
+    executor = ThreadPoolExecutor(max_workers=workers)
+    pending = {}
+    try:
+        for index, item in enumerate(items):
+            pending[executor.submit(call, item)] = (index, item)
+            if len(pending) >= workers * 2:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield collect(future, *pending.pop(future))
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield collect(future, *pending.pop(future))
+    finally:
+        for future in pending:
+            future.cancel()
+        executor.shutdown(wait=True)
+
+
+def add_users(users, specs, workers=8, rate=None):
+    """
+    Create many users and add them to their groups
+
+    Every spec is a dictionary with the keys `username`, `password` and
+    optionally `name`, `email`, `props` and `groups`. Users that already exist
+    are reported as EXISTS and are still added to their groups. A user that
+    was created or already existed but could not be added to its groups is
+    reported as PARTIAL, with the exception in `error`; running the spec
+    again only adds the groups.
+
+    :param users: `Users` client
+    :param specs: Iterable of user specs
+    :param workers: (optional) Number of concurrent users. Default: 8
+    :param rate: (optional) Maximum number of users started per second. Default: None (unlimited)
+    :return: Generator of `BulkResult` with status CREATED, EXISTS, PARTIAL or FAILED
+    """
+    def provision(spec):
+        try:
+            result = users.add_user(spec['username'], spec['password'], name=spec.get('name'),
+                                    email=spec.get('email'), props=spec.get('props'))
+            status = BulkResult.CREATED
+        except UserAlreadyExistsException:
+            result = None
+            status = BulkResult.EXISTS
+        if spec.get('groups'):
+            try:
+                users.add_user_groups(spec['username'], spec['groups'])
+            except Exception as e:
+                return BulkResult.PARTIAL, result, e
+        return status, result
+
+    return run_bulk(provision, specs, workers=workers, rate=rate)
+
+
+def close_sessions(sessions, usernames=None, predicate=None, lock_users=None, workers=8, rate=None):
+    """
+    Close the sessions of many users
+
+    Users are given by name or selected with a predicate over the current
+    sessions. The API closes all sessions of a user, so a user is
+    disconnected completely as soon as one of the sessions matches. Every
+    user is handled once, even if named more than once.
+
+    :param sessions: `Sessions` client
+    :param usernames: (optional) Iterable of user names
+    :param predicate: (optional) Function taking a `Session` record. Users with a session it returns True for are disconnected
+    :param lock_users: (optional) `Users` client. When given, every user is locked out before the sessions are closed, so it cannot log in again
+    :param workers: (optional) Number of concurrent users. Default: 8
+    :param rate: (optional) Maximum number of users started per second. Default: None (unlimited)
+    :return: Generator of `BulkResult` whose items are user names. PARTIAL means the sessions were closed but locking the user failed
+    """
+    selected = []
+    seen = set()
+    for username in usernames or ():
+        if username not in seen:
+            seen.add(username)
+            selected.append(username)
+    if predicate is not None:
+        for session in SessionSnapshot.load(sessions):
+            if session.username not in seen and predicate(session):
+                seen.add(session.username)
+                selected.append(session.username)
+
+    def close(username):
+        error = None
+        if lock_users is not None:
+            try:
+                lock_users.lock_user(username)
+            except Exception as e:
+                # Disconnect the user anyway
+                error = e
+        result = sessions.close_user_sessions(username)
+        if error is not None:
+            return BulkResult.PARTIAL, result, error
+        return BulkResult.OK, result
+
+    return run_bulk(close, selected, workers=workers, rate=rate)
@@ -0,0 +1,177 @@
+# -*- coding: utf-8 -*-
+import threading
+import time
+from collections import OrderedDict
+
+
+class Cache(object):
+    """
+    TTL/LRU cache for GET results
+
+    Entries are keyed by secret, URL and query parameters. A write (POST, PUT, DELETE)
+    sent through a client using the cache evicts every cached entry whose path
+    is the written path, one of its parents or one of its children. E.g.
+    `update_user('bob')` evicts `get_user('bob')`, `get_users()` and
+    `get_user_roster('bob')`.
+
+    Responses with an `ETag` or `Last-Modified` header keep their validators.
+    When such an entry expires, the next request is sent as a conditional GET
+    and a `304 Not Modified` answer renews the cached result without
+    downloading it again. With a TTL of 0 only these responses are stored and
+    every call is revalidated.
+
+    Cached results are shared between callers and must not be modified.
+    """
+
+    def __init__(self, maxsize=1024, ttl=60, ttls=None):
+        """
+        :param maxsize: (optional) Maximum number of cached results. Default: 1024
+        :param ttl: (optional) Seconds a result is kept. None keeps it until evicted. Default: 60
+        :param ttls: (optional) Per-endpoint TTL overrides. The longest matching endpoint prefix wins
+        :type ttls: Dictionary. E.g. {'/plugins/restapi/v1/system/properties': 300}
+        """
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.ttls = sorted((ttls or {}).items(), key=lambda item: len(item[0]), reverse=True)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self.revalidations = 0
+        self.generation = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(secret, host, endpoint, params=None):
+        """
+        Build the cache key of a request
+
+        Results are kept per secret, so clients with other credentials never
+        see them.
+
+        :param secret: Shared secret key of the client
+        :param host: Scheme://Host/ of the request
+        :param endpoint: Plugin endpoint of the request
+        :param params: (optional) Query parameters of the request
+        """
+        if params:
+            params = tuple(sorted((key, value) for key, value in params.items() if value is not None))
+        return (secret, host, endpoint, params or ())
+
+    def ttl_for(self, endpoint):
+        """
+        Return the TTL for an endpoint
+
+        :param endpoint: Plugin endpoint
+        """
+        for prefix, ttl in self.ttls:
+            if endpoint.startswith(prefix):
+                return ttl
+        return self.ttl
+
+    @staticmethod
+    def make_validators(response):
+        """
+        Build conditional request headers from a response
+
+        :param response: Response object of the transport
+        :return: Dictionary of headers or None
+        """
+        validators = {}
+        etag = response.headers.get('ETag')
+        if etag:
+            validators['If-None-Match'] = etag
+        modified = response.headers.get('Last-Modified')
+        if modified:
+            validators['If-Modified-Since'] = modified
+        return validators or None
+
+    def get(self, key):
+        """
+        Look up a result
+
+        :param key: Key from `make_key`
+        :return: Tuple of (fresh, result, validators). An expired entry with validators is returned with fresh set to False
+        """
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                expires, result, validators = entry
+                self._data.move_to_end(key)
+                if expires is None or expires > time.time():
+                    self.hits += 1
+                    return True, result, validators
+                self.misses += 1
+                if validators:
+                    return False, result, validators
+                del self._data[key]
+                return False, None, None
+            self.misses += 1
+            return False, None, None
+
+    def set(self, key, result, generation=None, validators=None, revalidated=False):
+        """
+        Store a result
+
+        :param key: Key from `make_key`
+        :param result: Result to store
+        :param generation: (optional) Value of `generation` read before the request was sent. The result is dropped if an invalidation happened since
+        :param validators: (optional) Conditional request headers from `make_validators`
+        :param revalidated: (optional) True if the result was confirmed by a `304 Not Modified` answer
+        """
+        ttl = self.ttl_for(key[2])
+        if ttl == 0 and not validators:
+            return
+        expires = time.time() + ttl if ttl is not None else None
+        with self._lock:
+            if revalidated:
+                self.revalidations += 1
+            if generation is not None and generation != self.generation:
+                return
+            self._data[key] = (expires, result, validators)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, host, endpoint):
+        """
+        Evict results of an endpoint, its parents and its children
+
+        :param host: Scheme://Host/ of the write
+        :param endpoint: Plugin endpoint of the write
+        """
+        with self._lock:
+            self.generation += 1
+            for key in list(self._data):
+                if key[1] != host:
+                    continue
+                cached = key[2]
+                if cached == endpoint or endpoint.startswith(cached + '/') or cached.startswith(endpoint + '/'):
+                    del self._data[key]
+                    self.invalidations += 1
+
+    def clear(self):
+        """
+        Drop all cached results
+        """
+        with self._lock:
+            self.generation += 1
+            self._data.clear()
+
+    def stats(self):
+        """
+        Return cache counters
+
+        :return: Dictionary with `size`, `hits`, `misses`, `evictions`, `invalidations` and `revalidations`
+        """
+        with self._lock:
+            return {
+                'size': len(self._data),
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations,
+                'revalidations': self.revalidations,
+            }
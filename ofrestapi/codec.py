@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+import json
+
+
+class Codec(object):
+    """
+    JSON codec of request and response bodies based on the standard library
+
+    Subclasses wrap faster JSON libraries. Bodies are encoded to and decoded
+    from bytes, so no separate text decoding step is needed.
+    """
+    name = 'json'
+
+    def encode(self, obj):
+        """
+        Serialize a JSON object
+
+        :param obj: JSON object
+        :return: UTF-8 encoded bytes
+        """
+        return json.dumps(obj, separators=(',', ':')).encode('utf-8')
+
+    def decode(self, data):
+        """
+        Parse a JSON document
+
+        :param data: Bytes of the body
+        :return: JSON object
+        """
+        return json.loads(data)
+
+    def __repr__(self):
+        return '<%s %s>' % (type(self).__name__, self.name)
+
+
+class OrjsonCodec(Codec):
+    """
+    Codec based on orjson
+    """
+    name = 'orjson'
+
+    def __init__(self):
+        import orjson
+        self.encode = orjson.dumps
+        self.decode = orjson.loads
+
+
+class UjsonCodec(Codec):
+    """
+    Codec based on ujson
+    """
+    name = 'ujson'
+
+    def __init__(self):
+        import ujson
+        self._ujson = ujson
+        self.decode = ujson.loads
+
+    def encode(self, obj):
+        return self._ujson.dumps(obj, ensure_ascii=False).encode('utf-8')
+
+
+CODECS = {
+    'orjson': OrjsonCodec,
+    'ujson': UjsonCodec,
+    'json': Codec,
+}
+# Order in which installed libraries are picked
+PREFERENCE = ('orjson', 'ujson', 'json')
+
+_default = None
+
+
+def get_codec(name=None):
+    """
+    Return a JSON codec
+
+    :param name: (optional) One of `orjson`, `ujson` and `json`. Default: None (the first installed in that order)
+    :return: `Codec` object
+    """
+    global _default
+    if name is not None:
+        return CODECS[name]()
+    if _default is None:
+        for candidate in PREFERENCE:
+            try:
+                _default = CODECS[candidate]()
+            except ImportError:
+                continue
+            break
+    return _default
@@ -0,0 +1,273 @@
+# -*- coding: utf-8 -*-
+import bisect
+import gzip
+import json
+import threading
+import time
+from collections import defaultdict
+
+from .exception import UserNotFoundException
+from .records import User
+
+# Length of the indexed substrings. Shorter queries are answered by a scan
+GRAM = 3
+FIELDS = ('username', 'name', 'email')
+
+
+def _user(item):
+    return User.from_json(item) if isinstance(item, dict) else item
+
+
+def _grams(values):
+    # Substrings spanning two fields contain the separator, which no query does
+    text = '\0'.join(values)
+    return {text[start:start + GRAM] for start in range(len(text) - GRAM + 1)}
+
+
+class UserDirectory(object):
+    """
+    Local mirror of all users with a substring and prefix search index
+
+    Fill it once with `load` and keep it fresh with `refresh`, `refresh_user`,
+    `put` and `remove`. Searches are case insensitive and need no requests.
+    A directory can be saved to and restored from a compressed snapshot file.
+    """
+
+    def __init__(self, users=(), taken=None):
+        """
+        :param users: (optional) Iterable of `User` records or JSON objects
+        :param taken: (optional) Time of the data. Default: now
+        """
+        self.taken = taken if taken is not None else time.time()
+        self.users = {}
+        self._values = {}
+        self._grams = defaultdict(set)
+        self._sorted = None
+        self._lock = threading.RLock()
+        for item in users:
+            self._add(_user(item))
+
+    @classmethod
+    def load(cls, users, stream=True):
+        """
+        Download all users
+
+        :param users: `Users` client
+        :param stream: (optional) Stream the response with `iter_users`. Default: True
+        """
+        if stream:
+            return cls(users.iter_users())
+        result = users.get_users()
+        return cls(result if isinstance(result, list) else User.from_list(result))
+
+    @staticmethod
+    def _fields(user):
+        return tuple((getattr(user, field) or '').lower() for field in FIELDS)
+
+    def _add(self, user):
+        values = self._fields(user)
+        self.users[user.username] = user
+        self._values[user.username] = values
+        grams = self._grams
+        for gram in _grams(values):
+            grams[gram].add(user.username)
+        self._sorted = None
+
+    def _discard(self, username):
+        if username not in self.users:
+            return None
+        user = self.users.pop(username)
+        for gram in _grams(self._values.pop(username)):
+            names = self._grams[gram]
+            names.discard(username)
+            if not names:
+                del self._grams[gram]
+        self._sorted = None
+        return user
+
+    def put(self, user):
+        """
+        Add or replace a user, e.g. after creating or updating it
+
+        :param user: `User` record or JSON object
+        """
+        user = _user(user)
+        with self._lock:
+            self._discard(user.username)
+            self._add(user)
+
+    def remove(self, username):
+        """
+        Drop a user, e.g. after deleting it
+
+        :param username: The user name
+        :return: The removed `User` or None
+        """
+        with self._lock:
+            return self._discard(username)
+
+    def refresh_user(self, users, username):
+        """
+        Reload one user from the server
+
+        :param users: `Users` client
+        :param username: The user name
+        :return: The `User`, or None if the user no longer exists
+        """
+        try:
+            user = _user(users.get_user(username))
+        except UserNotFoundException:
+            self.remove(username)
+            return None
+        self.put(user)
+        return user
+
+    def refresh(self, users, stream=True):
+        """
+        Download all users and apply the differences
+
+        This is a full download of the user list. Only users that were added,
+        changed or removed are re-indexed.
+
+        :param users: `Users` client
+        :param stream: (optional) Stream the response with `iter_users`. Default: True
+        :return: Tuple of (added, changed, removed) lists of user names
+        """
+        fresh = self.load(users, stream=stream)
+        added, changed = [], []
+        with self._lock:
+            for username, user in fresh.users.items():
+                current = self.users.get(username)
+                if current is None:
+                    added.append(username)
+                elif current != user:
+                    changed.append(username)
+                else:
+                    continue
+                self._discard(username)
+                self._add(user)
+            removed = [username for username in self.users if username not in fresh.users]
+            for username in removed:
+                self._discard(username)
+            self.taken = fresh.taken
+        return added, changed, removed
+
+    def get(self, username):
+        """
+        Return a user or None
+
+        :param username: The user name
+        """
+        return self.users.get(username)
+
+    def search(self, query, fields=FIELDS, limit=None):
+        """
+        Find users with the query in one of the fields, like `get_users(query)` does on the server
+
+        :param query: Substring to look for
+        :param fields: (optional) Fields to search. Default: `username`, `name` and `email`
+        :param limit: (optional) Maximum number of results. Default: None (all)
+        :return: List of `User` ordered by user name
+        """
+        query = query.lower()
+        columns = [FIELDS.index(field) for field in fields]
+        values = self._values
+        with self._lock:
+            if len(query) < GRAM:
+                # Scan in user name order and stop at the limit
+                found = []
+                for username in self._usernames():
+                    if any(query in values[username][column] for column in columns):
+                        found.append(username)
+                        if len(found) == limit:
+                            break
+                return [self.users[username] for username in found]
+            postings = []
+            for start in range(len(query) - GRAM + 1):
+                names = self._grams.get(query[start:start + GRAM])
+                if not names:
+                    return []
+                postings.append(names)
+            postings.sort(key=len)
+            candidates = postings[0].intersection(*postings[1:])
+            found = sorted(username for username in candidates
+                           if any(query in values[username][column] for column in columns))
+            if limit is not None:
+                found = found[:limit]
+            return [self.users[username] for username in found]
+
+    def prefix(self, query, fields=FIELDS, limit=None):
+        """
+        Find users with a field starting with the query
+
+        :param query: Prefix to look for
+        :param fields: (optional) Fields to search. Default: `username`, `name` and `email`
+        :param limit: (optional) Maximum number of results. Default: None (all)
+        :return: List of `User` ordered by user name
+        """
+        query = query.lower()
+        found = set()
+        with self._lock:
+            self._build_sorted()
+            for field in fields:
+                entries = self._sorted[field]
+                index = bisect.bisect_left(entries, (query, ''))
+                while index < len(entries) and entries[index][0].startswith(query):
+                    found.add(entries[index][1])
+                    index += 1
+            found = sorted(found)
+            if limit is not None:
+                found = found[:limit]
+            return [self.users[username] for username in found]
+
+    def _build_sorted(self):
+        if self._sorted is None:
+            self._sorted = dict((field, sorted((values[column], username)
+                                               for username, values in self._values.items() if values[column]))
+                                for column, field in enumerate(FIELDS))
+            self._sorted[None] = sorted(self.users)
+
+    def _usernames(self):
+        self._build_sorted()
+        return self._sorted[None]
+
+    def save(self, path):
+        """
+        Write a compressed snapshot of the users. The index is rebuilt on restore
+
+        :param path: File name
+        """
+        with self._lock:
+            rows = [[user.username, user.name, user.email, [list(pair) for pair in user._properties]]
+                    for user in self.users.values()]
+            data = {'taken': self.taken, 'users': rows}
+        with gzip.open(path, 'wt', encoding='utf-8') as f:
+            json.dump(data, f, separators=(',', ':'))
+
+    @classmethod
+    def restore(cls, path):
+        """
+        Read a snapshot written by `save`
+
+        :param path: File name
+        """
+        with gzip.open(path, 'rt', encoding='utf-8') as f:
+            data = json.load(f)
+        users = []
+        for username, name, email, properties in data['users']:
+            user = User.__new__(User)
+            user.username = username
+            user.name = name
+            user.email = email
+            user._properties = tuple(tuple(pair) for pair in properties)
+            users.append(user)
+        return cls(users, taken=data['taken'])
+
+    def __len__(self):
+        return len(self.users)
+
+    def __iter__(self):
+        return iter(list(self.users.values()))
+
+    def __contains__(self, username):
+        return username in self.users
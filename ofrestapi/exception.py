@@ -51,3 +51,7 @@ class NotAllowedException(Exception):
 
 class AlreadyExistsException(Exception):
     pass
+
+
+class CircuitOpenException(Exception):
+    pass
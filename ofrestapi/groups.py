@@ -1,23 +1,24 @@
 # -*- coding: utf-8 -*-
-from requests import (get, put, post, delete)
-from base import Base
+from .base import Base
+from .records import Group
 
 
 class Groups(Base):
 
-    def __init__(self, host, secret, endpoint='/plugins/restapi/v1/groups'):
+    def __init__(self, host, secret, endpoint='/plugins/restapi/v1/groups', **kwargs):
         """
         :param host: Scheme://Host/ for API requests
         :param secret: Shared secret key for API requests
         :param endpoint: Endpoint for API requests
+        :param kwargs: (optional) Client options. See `Base`
         """
-        super(Groups, self).__init__(host, secret, endpoint)
+        super(Groups, self).__init__(host, secret, endpoint, **kwargs)
 
     def get_groups(self):
         """
         Retrieve all groups
         """
-        return self._submit_request(get, self.endpoint)
+        return self._submit_request('GET', self.endpoint, record=Group.from_list, template='/groups')
 
     def get_group(self, groupname):
         """
@@ -26,7 +27,7 @@ class Groups(Base):
         :param groupname: The exact group name for request
         """
         endpoint = '/'.join([self.endpoint, groupname])
-        return self._submit_request(get, endpoint)
+        return self._submit_request('GET', endpoint, record=Group.from_json, template='/groups/{groupname}')
 
     def add_group(self, groupname, description):
         """
@@ -39,7 +40,7 @@ class Groups(Base):
             'name': groupname,
             'description': description,
         }
-        return self._submit_request(post, self.endpoint, json=payload)
+        return self._submit_request('POST', self.endpoint, json=payload, template='/groups')
 
     def delete_group(self, groupname):
         """
@@ -48,7 +49,7 @@ class Groups(Base):
         :param groupname: The exact group name for request
         """
         endpoint = '/'.join([self.endpoint, groupname])
-        return self._submit_request(delete, endpoint)
+        return self._submit_request('DELETE', endpoint, template='/groups/{groupname}')
 
     def update_group(self, groupname, description):
         """
@@ -62,4 +63,4 @@ class Groups(Base):
             'name': groupname,
             'description': description,
         }
-        return self._submit_request(put, endpoint, json=payload)
+        return self._submit_request('PUT', endpoint, json=payload, template='/groups/{groupname}')
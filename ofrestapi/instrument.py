@@ -0,0 +1,197 @@
+# -*- coding: utf-8 -*-
+import math
+import threading
+from time import perf_counter
+
+
+class RequestInfo(object):
+    """
+    Description of one API call passed to hooks
+
+    Timings are in seconds. `queued` is the time spent waiting for the
+    throttle, `connect` the time spent opening connections, `server` the rest
+    of the time until the response was received, and `decode` the time spent
+    parsing the JSON body. Sizes are body sizes in bytes.
+    """
+    __slots__ = ('method', 'template', 'url', 'status', 'sent', 'received', 'queued', 'connect',
+                 'server', 'decode', 'elapsed', 'attempts', 'cached', 'error', 'start')
+
+    def __init__(self, method, template, url):
+        """
+        :param method: HTTP method. E.g. `GET`
+        :param template: Endpoint template. E.g. `/users/{username}/roster`
+        :param url: Full URL of the request
+        """
+        self.method = method
+        self.template = template
+        self.url = url
+        self.status = None
+        self.sent = 0
+        self.received = 0
+        self.queued = 0.0
+        self.connect = 0.0
+        self.server = 0.0
+        self.decode = 0.0
+        self.elapsed = None
+        self.attempts = 0
+        self.cached = False
+        self.error = None
+        self.start = perf_counter()
+
+    def measure(self, response, duration, transport, stream=False):
+        """
+        Record status, sizes and transport timings of a response
+
+        :param response: Response object of the transport
+        :param duration: Seconds spent in the transport
+        :param transport: The transport that sent the request
+        :param stream: (optional) The body has not been read yet. Default: False
+        """
+        self.status = response.status_code
+        self.sent, self.received = transport.body_sizes(response, stream)
+        self.connect = getattr(response, 'connect_time', 0.0)
+        self.server = max(0.0, duration - self.connect)
+
+    def __repr__(self):
+        return '<RequestInfo %s %s %s>' % (self.method, self.template, self.status)
+
+
+class Hook(object):
+    """
+    Base class of request hooks
+
+    Pass hooks to a client with the `hooks` option. Hooks are called from the
+    thread (or task) sending the request and must be thread safe.
+    """
+
+    def before_request(self, info):
+        """
+        Called before a request is sent
+
+        :param info: `RequestInfo` with method, template and URL
+        """
+
+    def after_request(self, info):
+        """
+        Called when a request is completed, answered from the cache or failed
+
+        :param info: Complete `RequestInfo`
+        """
+
+
+class Histogram(object):
+    """
+    Log-scale histogram of durations with bounded memory
+
+    Values are counted in buckets growing by 10%, so percentiles are
+    accurate to about 10%.
+    """
+    MIN = 1e-5
+    GROWTH = 1.1
+
+    def __init__(self):
+        self.buckets = {}
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self._log_growth = math.log(self.GROWTH)
+
+    def add(self, value):
+        """
+        :param value: Duration in seconds
+        """
+        if value <= self.MIN:
+            index = 0
+        else:
+            index = int(math.log(value / self.MIN) / self._log_growth) + 1
+        self.buckets[index] = self.buckets.get(index, 0) + 1
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+
+    def percentile(self, percent):
+        """
+        Return an upper bound of the given percentile
+
+        :param percent: Percentile. E.g. 95
+        """
+        if not self.count:
+            return None
+        rank = max(1, int(math.ceil(self.count * percent / 100.0)))
+        seen = 0
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if seen >= rank:
+                return min(self.max, self.MIN * self.GROWTH ** index)
+        return self.max
+
+
+class Metrics(Hook):
+    """
+    Hook collecting per-endpoint counters and latency histograms
+
+    Calls are grouped by method and endpoint template, e.g. `GET /users/{username}`.
+    """
+
+    def __init__(self):
+        self._endpoints = {}
+        self._lock = threading.Lock()
+
+    def after_request(self, info):
+        key = '%s %s' % (info.method, info.template)
+        with self._lock:
+            stats = self._endpoints.get(key)
+            if stats is None:
+                stats = self._endpoints[key] = {
+                    'count': 0, 'errors': 0, 'cached': 0, 'sent': 0, 'received': 0,
+                    'queued': 0.0, 'connect': 0.0, 'server': 0.0, 'decode': 0.0, 'latency': Histogram(),
+                }
+            stats['count'] += 1
+            if info.error is not None:
+                stats['errors'] += 1
+            if info.cached:
+                stats['cached'] += 1
+            stats['sent'] += info.sent
+            stats['received'] += info.received
+            stats['queued'] += info.queued
+            stats['connect'] += info.connect
+            stats['server'] += info.server
+            stats['decode'] += info.decode
+            stats['latency'].add(info.elapsed)
+
+    def snapshot(self):
+        """
+        Return the collected metrics
+
+        :return: Dictionary keyed by `METHOD /template` with `count`, `errors`, `cached`, `sent`, `received`, mean `queued`/`connect`/`server`/`decode` times and latency `mean`, `p50`, `p95`, `p99` and `max`
+        """
+        snapshot = {}
+        with self._lock:
+            for key, stats in self._endpoints.items():
+                latency = stats['latency']
+                count = stats['count']
+                snapshot[key] = {
+                    'count': count,
+                    'errors': stats['errors'],
+                    'cached': stats['cached'],
+                    'sent': stats['sent'],
+                    'received': stats['received'],
+                    'queued': stats['queued'] / count,
+                    'connect': stats['connect'] / count,
+                    'server': stats['server'] / count,
+                    'decode': stats['decode'] / count,
+                    'mean': latency.total / count,
+                    'p50': latency.percentile(50),
+                    'p95': latency.percentile(95),
+                    'p99': latency.percentile(99),
+                    'max': latency.max,
+                }
+        return snapshot
+
+    def reset(self):
+        """
+        Drop the collected metrics
+        """
+        with self._lock:
+            self._endpoints.clear()
@@ -1,28 +1,162 @@
 # -*- coding: utf-8 -*-
-from requests import (get, post)
-from base import Base
+import threading
+import time
+
+from .base import Base
+from .bulk import BulkResult, RateLimiter, run_bulk
+
+
+class BroadcastQueue(object):
+    """
+    Background sender coalescing bursts of broadcasts
+
+    Messages queued within `window` seconds of each other are joined into one
+    broadcast. A message that is already waiting is not queued twice.
+    """
+
+    def __init__(self, messages, window=0.5, rate=None, separator='\n'):
+        """
+        :param messages: `Messages` client sending the broadcasts
+        :param window: (optional) Seconds to wait for more messages before sending. Default: 0.5
+        :param rate: (optional) Maximum number of broadcasts sent per second. Default: None (unlimited)
+        :param separator: (optional) String joining coalesced messages. Default: newline
+        """
+        self.messages = messages
+        self.window = window
+        self.rate = rate
+        self.separator = separator
+        self.queued = 0
+        self.sent = 0
+        self.failed = 0
+        self.last_error = None
+        self._limiter = RateLimiter(rate) if rate else None
+        self._pending = []
+        self._busy = False
+        self._closed = False
+        self._cond = threading.Condition()
+        self._thread = None
+
+    def _add(self, message):
+        if self._closed:
+            raise RuntimeError('Broadcast queue is closed')
+        self.queued += 1
+        if message not in self._pending:
+            self._pending.append(message)
+
+    def _take(self):
+        body = self.separator.join(self._pending)
+        del self._pending[:]
+        return body
+
+    def _record(self, error=None):
+        if error is None:
+            self.sent += 1
+        else:
+            self.failed += 1
+            self.last_error = error
+
+    def put(self, message):
+        """
+        Queue a message without waiting for it to be sent
+
+        :param message: Message to be send
+        """
+        with self._cond:
+            self._add(message)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='ofrestapi-broadcast')
+                self._thread.daemon = True
+                self._thread.start()
+            self._cond.notify_all()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._pending and not self._closed:
+                    self._cond.wait()
+                if not self._pending:
+                    return
+                self._busy = True
+            if self.window and not self._closed:
+                time.sleep(self.window)
+            if self._limiter:
+                self._limiter.wait()
+            with self._cond:
+                body = self._take()
+            try:
+                self.messages.send_broadcast(body)
+            except Exception as e:
+                self._record(e)
+            else:
+                self._record()
+            with self._cond:
+                self._busy = False
+                self._cond.notify_all()
+
+    def flush(self, timeout=None):
+        """
+        Wait until all queued messages are sent
+
+        :param timeout: (optional) Maximum seconds to wait. Default: None (no timeout)
+        :return: True if the queue is empty
+        """
+        with self._cond:
+            return self._cond.wait_for(lambda: not self._pending and not self._busy, timeout)
+
+    def close(self):
+        """
+        Send the queued messages and stop the sender
+        """
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join()
+
+    def stats(self):
+        """
+        Return queue counters
+
+        :return: Dictionary with `queued` messages, `pending` messages, `sent` broadcasts and `failed` broadcasts
+        """
+        return {
+            'queued': self.queued,
+            'pending': len(self._pending),
+            'sent': self.sent,
+            'failed': self.failed,
+        }
 
 
 class Messages(Base):
+    broadcast_queue_class = BroadcastQueue
 
-    def __init__(self, host, secret, endpoint='/plugins/restapi/v1/messages/users'):
+    def __init__(self, host, secret, endpoint='/plugins/restapi/v1/messages/users',
+                 broadcast_window=0.5, broadcast_rate=None, **kwargs):
         """
         :param host: Scheme://Host/ for API requests
         :param secret: Shared secret key for API requests
         :param endpoint: Endpoint for API requests
+        :param broadcast_window: (optional) Seconds queued broadcasts wait to be coalesced. Default: 0.5
+        :param broadcast_rate: (optional) Maximum number of queued broadcasts sent per second. Default: None (unlimited)
+        :param kwargs: (optional) Client options. See `Base`
         """
-        super(Messages, self).__init__(host, secret, endpoint)
+        super(Messages, self).__init__(host, secret, endpoint, **kwargs)
+        self.broadcasts = self.broadcast_queue_class(self, window=broadcast_window, rate=broadcast_rate)
 
-    def send_broadcast(self, message):
+    def send_broadcast(self, message, queued=False):
         """
         Send a broadcast/server message to all online users
 
         :param message: Message to be send
+        :param queued: (optional) Return at once and send the message from `broadcasts`, coalesced with other queued messages. Default: False
         """
+        if queued:
+            self.broadcasts.put(message)
+            return True
         payload = {
             'body': message,
         }
-        return self._submit_request(post, self.endpoint, json=payload)
+        return self._submit_request('POST', self.endpoint, json=payload, template='/messages/users')
 
     def get_unread_messages(self, jid):
         """
@@ -31,4 +165,16 @@ class Messages(Base):
         :param jid: The JID for get messages count from
         """
         endpoint = '/plugins/restapi/v1/archive/messages/unread/' + jid
-        return self._submit_request(get, endpoint)
+        return self._submit_request('GET', endpoint, template='/archive/messages/unread/{jid}')
+
+    def iter_unread_messages(self, jids, workers=8, rate=None):
+        """
+        Retrieve unread messages counts of many JIDs concurrently
+
+        :param jids: Iterable of JIDs
+        :param workers: (optional) Number of concurrent requests. Default: 8
+        :param rate: (optional) Maximum number of requests started per second. Default: None (unlimited)
+        :return: Generator of `BulkResult` whose items are the JIDs, in completion order
+        """
+        return run_bulk(lambda jid: (BulkResult.OK, self.get_unread_messages(jid)), jids,
+                        workers=workers, rate=rate)
@@ -1,17 +1,18 @@
 # -*- coding: utf-8 -*-
-from requests import (get, put, post, delete)
-from base import Base
+from .base import Base
+from .records import Room
 
 
 class Muc(Base):
 
-    def __init__(self, host, secret, endpoint='/plugins/restapi/v1/chatrooms'):
+    def __init__(self, host, secret, endpoint='/plugins/restapi/v1/chatrooms', **kwargs):
         """
         :param host: Scheme://Host/ for API requests
         :param secret: Shared secret key for API requests
         :param endpoint: Endpoint for API requests
+        :param kwargs: (optional) Client options. See `Base`
         """
-        super(Muc, self).__init__(host, secret, endpoint)
+        super(Muc, self).__init__(host, secret, endpoint, **kwargs)
 
     def get_room(self, roomname, servicename='conference'):
         """
@@ -22,7 +23,7 @@ class Muc(Base):
         """
         endpoint = '/'.join([self.endpoint, roomname])
         params = {'servicename': servicename}
-        return self._submit_request(get, endpoint, params=params)
+        return self._submit_request('GET', endpoint, params=params, record=Room.from_json, template='/chatrooms/{roomname}')
 
     def get_rooms(self, servicename='conference', typeof='public', query=None):
         """
@@ -37,7 +38,24 @@ class Muc(Base):
             'type': typeof,
             'search': query,
         }
-        return self._submit_request(get, self.endpoint, params=params)
+        return self._submit_request('GET', self.endpoint, params=params, record=Room.from_list, template='/chatrooms')
+
+    def iter_rooms(self, servicename='conference', typeof='public', query=None):
+        """
+        Iterate over all chat rooms or chat rooms filtered by chat room name
+
+        The response is streamed and chat rooms are yielded one at a time.
+
+        :param servicename: (optional) The name of the Group Chat Service. Default: `conference`
+        :param typeof: (optional) Search only specified type of the rooms. Values: `all`, `public`. Default: `puclic`
+        :param query: (optional) Search/Filter by room name. This act like the wildcard search %String%
+        """
+        params = {
+            'servicename': servicename,
+            'type': typeof,
+            'search': query,
+        }
+        return self._iter_request('GET', self.endpoint, params=params, record=Room.from_json, template='/chatrooms')
 
     def get_room_users(self, roomname, servicename='conference'):
         """
@@ -48,7 +66,7 @@ class Muc(Base):
         """
         endpoint = '/'.join([self.endpoint, roomname, 'participants'])
         params = {'servicename': servicename}
-        return self._submit_request(get, endpoint, params=params)
+        return self._submit_request('GET', endpoint, params=params, template='/chatrooms/{roomname}/participants')
 
     def add_room(self, roomname, name, description, servicename='conference',
                  subject=None, password=None, maxusers=0, persistent=True,
@@ -113,7 +131,7 @@ class Muc(Base):
             'outcasts': {'outcast': outcasts},
         }
         params = {'servicename': servicename}
-        return self._submit_request(post, self.endpoint, json=payload, params=params)
+        return self._submit_request('POST', self.endpoint, json=payload, params=params, template='/chatrooms')
 
     def delete_room(self, roomname, servicename='conference'):
         """
@@ -124,7 +142,7 @@ class Muc(Base):
         """
         endpoint = '/'.join([self.endpoint, roomname])
         params = {'servicename': servicename}
-        return self._submit_request(delete, endpoint, params=params)
+        return self._submit_request('DELETE', endpoint, params=params, template='/chatrooms/{roomname}')
 
     def update_room(self, roomname, name=None, description=None, servicename='conference',
                     subject=None, password=None, maxusers=0, persistent=True,
@@ -190,7 +208,7 @@ class Muc(Base):
             'outcasts': {'outcast': outcasts},
         }
         params = {'servicename': servicename}
-        return self._submit_request(put, endpoint, json=payload, params=params)
+        return self._submit_request('PUT', endpoint, json=payload, params=params, template='/chatrooms/{roomname}')
 
     def grant_user_role(self, roomname, username, role, servicename='conference'):
         """
@@ -203,7 +221,7 @@ class Muc(Base):
         """
         endpoint = '/'.join([self.endpoint, roomname, role, username])
         params = {'servicename': servicename}
-        return self._submit_request(post, endpoint, params=params)
+        return self._submit_request('POST', endpoint, params=params, template='/chatrooms/{roomname}/{role}/{username}')
 
     def revoke_user_role(self, roomname, username, role, servicename='conference'):
         """
@@ -216,4 +234,4 @@ class Muc(Base):
         """
         endpoint = '/'.join([self.endpoint, roomname, role, username])
         params = {'servicename': servicename}
-        return self._submit_request(delete, endpoint, params=params)
+        return self._submit_request('DELETE', endpoint, params=params, template='/chatrooms/{roomname}/{role}/{username}')
@@ -0,0 +1,382 @@
+# -*- coding: utf-8 -*-
+import json
+import sqlite3
+import threading
+import time
+from collections import deque
+
+from .base import Base
+from .exception import CircuitOpenException, InvalidResponseException
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS ops (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    host TEXT NOT NULL,
+    key TEXT NOT NULL,
+    method TEXT NOT NULL,
+    endpoint TEXT NOT NULL,
+    template TEXT,
+    body TEXT NOT NULL,
+    created REAL NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS failed (
+    id INTEGER PRIMARY KEY,
+    host TEXT NOT NULL,
+    key TEXT NOT NULL,
+    method TEXT NOT NULL,
+    endpoint TEXT NOT NULL,
+    template TEXT,
+    body TEXT NOT NULL,
+    created REAL NOT NULL,
+    attempts INTEGER NOT NULL,
+    error TEXT
+);
+'''
+
+# Statuses of answers without an error body that are worth sending again
+RETRY_STATUSES = (429,)
+# Payload fields naming the entity created by a POST to a collection
+ID_FIELDS = ('username', 'roomName', 'name', '@key', 'jid')
+# Collections whose writes act on an entity of another collection, e.g. a lockout on a user
+SAME_ENTITY = {'lockouts': 'users', 'sessions': 'users'}
+
+
+def entity_key(endpoint, template=None, kwargs=None):
+    """
+    Return the entity a write belongs to. Writes of one entity are sent in order
+
+    The key is the endpoint up to the first variable of its template, e.g.
+    `/users/alice` for `/users/{username}/roster/{jid}`. For a POST to a
+    collection the name of the new entity is taken from the payload. Lockouts
+    and sessions of a user share the key of the user.
+
+    Writes of different entities are not ordered against each other, e.g.
+    `add_group` and a later `add_user_groups` adding a user to that group.
+
+    :param endpoint: Plugin endpoint of the request
+    :param template: (optional) Endpoint template. E.g. `/users/{username}`
+    :param kwargs: (optional) Arguments of the request
+    """
+    kwargs = kwargs or {}
+    parts = endpoint.split('/')
+    names = (template or endpoint).split('/')
+    offset = len(parts) - len(names)
+    for index, name in enumerate(names):
+        if name.startswith('{'):
+            key = '/'.join(parts[:offset + index + 1])
+            break
+    else:
+        key = endpoint
+        payload = kwargs.get('json')
+        if isinstance(payload, dict):
+            for field in ID_FIELDS:
+                if payload.get(field):
+                    key = '%s/%s' % (endpoint, payload[field])
+                    break
+    collection, _, name = key.rpartition('/')
+    head, _, collection = collection.rpartition('/')
+    if collection in SAME_ENTITY and name:
+        key = '/'.join([head, SAME_ENTITY[collection], name])
+    servicename = (kwargs.get('params') or {}).get('servicename')
+    if servicename:
+        key = '%s?servicename=%s' % (key, servicename)
+    return key
+
+
+class Operation(object):
+    """
+    One queued write
+    """
+    __slots__ = ('id', 'host', 'key', 'method', 'endpoint', 'template', 'kwargs', 'created', 'attempts')
+
+    def __init__(self, id, host, key, method, endpoint, template, kwargs, created, attempts=0):
+        self.id = id
+        self.host = host
+        self.key = key
+        self.method = method
+        self.endpoint = endpoint
+        self.template = template
+        self.kwargs = kwargs
+        self.created = created
+        self.attempts = attempts
+
+    def __repr__(self):
+        return '<Operation %d %s %s>' % (self.id, self.method, self.endpoint)
+
+
+class Outbox(object):
+    """
+    Durable queue of POST, PUT and DELETE requests sent in the background
+
+    Writes are appended to a SQLite database and return at once. Worker
+    threads send them with bounded concurrency; writes of the same entity
+    are sent one at a time in the order they were queued; writes of different
+    entities may overtake each other. While the server
+    is unreachable the writes are kept and retried, also across restarts.
+    A queued update that has not been sent yet absorbs a newer update of
+    the same resource, so only the latest state goes out.
+    """
+    # Writes that replace the state of a resource, so a newer one supersedes an older one
+    COLLAPSIBLE = (
+        'PUT /users/{username}',
+        'PUT /users/{username}/roster/{jid}',
+        'PUT /groups/{groupname}',
+        'PUT /chatrooms/{roomname}',
+        'POST /system/properties',
+    )
+
+    def __init__(self, path, workers=4, retry_interval=5.0, max_attempts=None, on_error=None):
+        """
+        :param path: File of the SQLite database. Created if missing
+        :param workers: (optional) Number of concurrent writes. Default: 4
+        :param retry_interval: (optional) Seconds to wait before resending a write the server did not accept. Default: 5.0
+        :param max_attempts: (optional) Give up on a write after this many failed attempts. Default: None (retry until sent)
+        :param on_error: (optional) Function called with the `Operation` and the exception when a write is given up
+        """
+        self.path = path
+        self.workers = workers
+        self.retry_interval = retry_interval
+        self.max_attempts = max_attempts
+        self.on_error = on_error
+        self.sent = 0
+        self.collapsed = 0
+        self.failed = 0
+        self.retries = 0
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.executescript(SCHEMA)
+        self._cond = threading.Condition()
+        self._senders = {}
+        self._queues = {}
+        self._ready = deque()
+        self._busy = set()
+        self._closed = False
+        self._threads = []
+        for row in self._db.execute('SELECT id, host, key, method, endpoint, template, body, created, attempts '
+                                    'FROM ops ORDER BY id'):
+            self._push(Operation(*(row[:6] + (json.loads(row[6]),) + row[7:])))
+
+    def _push(self, op):
+        queue_key = (op.host, op.key)
+        queue = self._queues.get(queue_key)
+        if queue is None:
+            queue = self._queues[queue_key] = deque()
+            self._ready.append(queue_key)
+        queue.append(op)
+
+    def bind(self, client):
+        """
+        Send the queued writes of the client's host with the client's options
+
+        Called by `Base` for clients created with this outbox.
+
+        :param client: API client
+        """
+        with self._cond:
+            if client.host not in self._senders:
+                self._senders[client.host] = self._make_sender(client)
+            if not self._threads:
+                for number in range(self.workers):
+                    thread = threading.Thread(target=self._run, name='ofrestapi-outbox-%d' % number)
+                    thread.daemon = True
+                    thread.start()
+                    self._threads.append(thread)
+            self._cond.notify_all()
+
+    def _make_sender(self, client):
+        """
+        Create the synchronous client sending the writes of a host
+        """
+        return Base(client.host, client.headers['Authorization'], '',
+                    cache=client.cache, retry=client.retry, breaker=client.breaker,
+                    hooks=client.hooks, throttle=client.throttle, codec=client.codec)
+
+    def append(self, host, method, endpoint, template=None, kwargs=None):
+        """
+        Queue a write
+
+        :param host: Scheme://Host/ of the API
+        :param method: HTTP method. E.g. `PUT`
+        :param endpoint: Plugin endpoint for request
+        :param template: (optional) Endpoint template. E.g. `/users/{username}`
+        :param kwargs: (optional) Arguments of the request. `json` and `params` must be JSON serializable
+        :return: True
+        """
+        kwargs = dict(kwargs or {})
+        key = entity_key(endpoint, template, kwargs)
+        with self._cond:
+            if self._closed:
+                raise RuntimeError('Outbox is closed')
+            queue = self._queues.get((host, key))
+            if queue and self._collapse(queue, method, endpoint, template, kwargs, (host, key) in self._busy):
+                return True
+            created = time.time()
+            cursor = self._db.execute(
+                'INSERT INTO ops (host, key, method, endpoint, template, body, created) VALUES (?, ?, ?, ?, ?, ?, ?)',
+                (host, key, method, endpoint, template, json.dumps(kwargs), created))
+            self._push(Operation(cursor.lastrowid, host, key, method, endpoint, template, kwargs, created))
+            self._cond.notify()
+        return True
+
+    def _collapse(self, queue, method, endpoint, template, kwargs, busy):
+        """
+        Merge a write into the last queued write of the entity if it supersedes it
+        """
+        last = queue[-1]
+        if busy and len(queue) == 1:
+            # The last write is being sent
+            return False
+        if (last.method != method or last.endpoint != endpoint or
+                '%s %s' % (method, template) not in self.COLLAPSIBLE):
+            return False
+        payload = last.kwargs.get('json')
+        if isinstance(payload, dict) and isinstance(kwargs.get('json'), dict):
+            payload.update((field, value) for field, value in kwargs['json'].items() if value is not None)
+            kwargs = dict(kwargs, json=payload)
+        last.kwargs = kwargs
+        self._db.execute('UPDATE ops SET body = ? WHERE id = ?', (json.dumps(kwargs), last.id))
+        self.collapsed += 1
+        return True
+
+    def _next(self):
+        """
+        Take the oldest ready entity whose host has a sender
+        """
+        for _ in range(len(self._ready)):
+            queue_key = self._ready.popleft()
+            if queue_key[0] in self._senders:
+                self._busy.add(queue_key)
+                return queue_key
+            self._ready.append(queue_key)
+        return None
+
+    def _run(self):
+        while True:
+            with self._cond:
+                queue_key = None
+                while queue_key is None:
+                    if self._closed:
+                        return
+                    queue_key = self._next()
+                    if queue_key is None:
+                        self._cond.wait()
+                op = self._queues[queue_key][0]
+                sender = self._senders[op.host]
+            done = self._send(sender, op)
+            with self._cond:
+                queue = self._queues[queue_key]
+                if done:
+                    queue.popleft()
+                    self._db.execute('DELETE FROM ops WHERE id = ?', (op.id,))
+                self._busy.discard(queue_key)
+                if queue:
+                    self._ready.append(queue_key)
+                else:
+                    del self._queues[queue_key]
+                self._cond.notify_all()
+
+    def _send(self, sender, op):
+        """
+        Send a write. Return True when it is done with, False to send it again
+        """
+        try:
+            sender._submit_request(op.method, op.endpoint, template=op.template, **op.kwargs)
+        except Exception as e:
+            op.attempts += 1
+            if self._retryable(sender, e) and (self.max_attempts is None or op.attempts < self.max_attempts):
+                with self._cond:
+                    self.retries += 1
+                    self._db.execute('UPDATE ops SET attempts = ? WHERE id = ?', (op.attempts, op.id))
+                    deadline = time.monotonic() + self.retry_interval
+                    while not self._closed and time.monotonic() < deadline:
+                        self._cond.wait(deadline - time.monotonic())
+                return False
+            with self._cond:
+                self.failed += 1
+                self._db.execute(
+                    'INSERT INTO failed (id, host, key, method, endpoint, template, body, created, attempts, error) '
+                    'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                    (op.id, op.host, op.key, op.method, op.endpoint, op.template, json.dumps(op.kwargs),
+                     op.created, op.attempts, repr(e)))
+            if self.on_error is not None:
+                self.on_error(op, e)
+            return True
+        with self._cond:
+            self.sent += 1
+        return True
+
+    @staticmethod
+    def _retryable(sender, error):
+        """
+        Return True if a failed write may succeed when sent again
+
+        Connection errors, an open circuit and 5xx or 429 answers are
+        temporary; any other answer would be the same the next time.
+        """
+        if isinstance(error, sender.transport.connection_errors + (CircuitOpenException,)):
+            return True
+        if isinstance(error, InvalidResponseException) and error.args:
+            # Answers without an error body carry their status code
+            status = error.args[0]
+            return isinstance(status, int) and (status >= 500 or status in RETRY_STATUSES)
+        return False
+
+    def pending(self):
+        """
+        Return the number of queued writes
+        """
+        with self._cond:
+            return sum(len(queue) for queue in self._queues.values())
+
+    def drain(self, timeout=None):
+        """
+        Wait until all queued writes of bound hosts are sent or given up
+
+        :param timeout: (optional) Maximum seconds to wait. Default: None (no timeout)
+        :return: True if no writes of bound hosts are left
+        """
+        with self._cond:
+            return self._cond.wait_for(
+                lambda: not any(host in self._senders for host, _ in self._queues), timeout)
+
+    def failures(self):
+        """
+        Return the writes that were given up
+
+        :return: List of (`Operation`, error) tuples
+        """
+        with self._cond:
+            rows = self._db.execute('SELECT id, host, key, method, endpoint, template, body, created, attempts, error '
+                                    'FROM failed ORDER BY id').fetchall()
+        return [(Operation(*(row[:6] + (json.loads(row[6]),) + row[7:9])), row[9]) for row in rows]
+
+    def stats(self):
+        """
+        Return queue counters
+
+        :return: Dictionary with `pending`, `sent`, `collapsed`, `failed` and `retries`
+        """
+        pending = self.pending()
+        with self._cond:
+            return {
+                'pending': pending,
+                'sent': self.sent,
+                'collapsed': self.collapsed,
+                'failed': self.failed,
+                'retries': self.retries,
+            }
+
+    def close(self, timeout=None):
+        """
+        Stop the workers once the writes being sent are done. Queued writes stay in the database
+
+        :param timeout: (optional) Maximum seconds to wait for every worker. Default: None (no timeout)
+        """
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        for thread in self._threads:
+            thread.join(timeout)
+        with self._cond:
+            self._db.close()
@@ -0,0 +1,205 @@
+# -*- coding: utf-8 -*-
+import threading
+import time
+
+from .records import Property
+
+
+class PropertyMirror(object):
+    """
+    Local copy of all system properties, refreshed in the background
+
+    All properties are loaded with one `get_props` call and reloaded every
+    `interval` seconds. Reads are answered from memory. Subscribers are called
+    for every property a refresh finds added, changed or removed. Writes with
+    `update_prop` and `delete_prop` of the mirrored client are applied at once.
+
+    Give the client a `Cache` with a TTL of 0 for the properties endpoint to
+    refresh with conditional GET requests, so an unchanged property list is
+    not downloaded again when the server sends validators.
+    """
+
+    def __init__(self, system, interval=60.0, start=True):
+        """
+        :param system: `System` client
+        :param interval: (optional) Seconds between refreshes. None disables the background refresh. Default: 60.0
+        :param start: (optional) Load the properties and start refreshing. Default: True
+        """
+        self.system = system
+        self.interval = interval
+        self.properties = {}
+        self.loaded = None
+        self.refreshes = 0
+        self.errors = 0
+        self.last_error = None
+        self._result = None
+        # Sequence number of the last write, and of the last write of each key
+        self._seq = 0
+        self._writes = {}
+        self._subscribers = []
+        self._lock = threading.RLock()
+        self._stop = threading.Event()
+        self._thread = None
+        system.mirror = self
+        if start:
+            self.start()
+
+    def start(self):
+        """
+        Load the properties and start the background refresh
+        """
+        self.refresh()
+        if self.interval and self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='ofrestapi-properties')
+            self._thread.daemon = True
+            self._thread.start()
+
+    def stop(self, timeout=None):
+        """
+        Stop the background refresh
+
+        :param timeout: (optional) Maximum seconds to wait for a refresh in progress. Default: None (no timeout)
+        """
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.refresh()
+            except Exception as e:
+                self._record(e)
+
+    def _record(self, error):
+        with self._lock:
+            self.errors += 1
+            self.last_error = error
+
+    def refresh(self):
+        """
+        Reload all properties now
+
+        :return: Dictionary of the changed keys mapped to (old, new) values. None stands for a missing property
+        """
+        since = self._seq
+        return self._update(self.system.get_props(), since)
+
+    def _update(self, result, since):
+        """
+        Replace the properties with the result of `get_props`
+
+        :param since: Value of `_seq` read before `get_props` was called. Keys written since then keep their value
+        """
+        with self._lock:
+            written = [key for key, seq in self._writes.items() if seq > since]
+            self._writes = dict((key, self._writes[key]) for key in written)
+            self.refreshes += 1
+            self.loaded = time.time()
+            if result is self._result:
+                # Renewed by a `304 Not Modified` answer
+                return {}
+            self._result = result
+            props = result if isinstance(result, list) else Property.from_list(result)
+            fresh = dict((prop.key, prop.value) for prop in props)
+            current = self.properties
+            for key in written:
+                # The result may predate the write
+                if key in current:
+                    fresh[key] = current[key]
+                else:
+                    fresh.pop(key, None)
+            changes = dict((key, (current.get(key), value)) for key, value in fresh.items()
+                           if current.get(key) != value or key not in current)
+            changes.update((key, (value, None)) for key, value in current.items() if key not in fresh)
+            self.properties = fresh
+        self._notify(changes)
+        return changes
+
+    def _written(self, key, value):
+        """
+        Apply a write of the mirrored client. A value of None deletes the property
+        """
+        with self._lock:
+            self._seq += 1
+            self._writes[key] = self._seq
+            old = self.properties.get(key)
+            if value is None:
+                if key not in self.properties:
+                    return
+                properties = dict(self.properties)
+                del properties[key]
+            elif key in self.properties and old == value:
+                return
+            else:
+                properties = dict(self.properties, **{key: value})
+            self.properties = properties
+        self._notify({key: (old, value)})
+
+    def subscribe(self, callback, key=None, prefix=None):
+        """
+        Call a function when properties change
+
+        :param callback: Function called with (key, old, new). None stands for a missing property
+        :param key: (optional) Only report this property
+        :param prefix: (optional) Only report properties starting with this prefix. Default: None (all properties)
+        :return: The callback, for `unsubscribe`
+        """
+        with self._lock:
+            self._subscribers.append((callback, key, prefix))
+        return callback
+
+    def unsubscribe(self, callback):
+        """
+        Stop calling a subscribed function
+
+        :param callback: Function given to `subscribe`
+        """
+        with self._lock:
+            self._subscribers = [entry for entry in self._subscribers if entry[0] is not callback]
+
+    def _notify(self, changes):
+        if not changes:
+            return
+        subscribers = self._subscribers
+        for name in sorted(changes):
+            old, new = changes[name]
+            for callback, key, prefix in subscribers:
+                if key is not None and key != name or prefix is not None and not name.startswith(prefix):
+                    continue
+                try:
+                    callback(name, old, new)
+                except Exception as e:
+                    self._record(e)
+
+    def get(self, key, default=None):
+        """
+        Return the value of a property
+
+        :param key: The name of system property
+        :param default: (optional) Value of a missing property. Default: None
+        """
+        return self.properties.get(key, default)
+
+    def items(self, prefix=''):
+        """
+        Return the properties starting with a prefix
+
+        :param prefix: (optional) Key prefix. Default: all properties
+        :return: Dictionary of keys and values
+        """
+        return dict((key, value) for key, value in self.properties.items() if key.startswith(prefix))
+
+    def __getitem__(self, key):
+        return self.properties[key]
+
+    def __contains__(self, key):
+        return key in self.properties
+
+    def __len__(self):
+        return len(self.properties)
+
+    def __iter__(self):
+        return iter(list(self.properties))
@@ -0,0 +1,203 @@
+# -*- coding: utf-8 -*-
+
+
+def to_list(value, key=None):
+    """
+    Normalize a collection of the API to a list
+
+    Openfire renders a collection with a single entry as the entry itself and
+    wraps collections in objects like `{'owner': [...]}`.
+
+    :param value: The collection
+    :param key: (optional) The key of the wrapper object
+    """
+    if isinstance(value, dict) and key is not None:
+        value = value.get(key)
+    if value is None:
+        return []
+    if isinstance(value, list):
+        return value
+    return [value]
+
+
+def to_bool(value):
+    if isinstance(value, bool) or value is None:
+        return value
+    return str(value).lower() == 'true'
+
+
+def to_int(value):
+    if value is None or value == '':
+        return None
+    return int(value)
+
+
+def to_pairs(value):
+    """
+    Turn a `{'property': [{'@key': ..., '@value': ...}]}` list into a tuple of (key, value) pairs
+    """
+    return tuple((prop.get('@key'), prop.get('@value')) for prop in to_list(value, 'property'))
+
+
+class Record(object):
+    """
+    Compact read-only view of an API entity
+
+    Values are decoded once, when the record is built, and stored in
+    `__slots__`; the JSON object is not kept. Properties are kept as a tuple
+    of pairs and turned into a dictionary on first access. Records compare
+    and hash by their fields, so they can be used in sets and as keys.
+    """
+    __slots__ = ()
+    # Tuples of (attribute, JSON key, decoder)
+    FIELDS = ()
+    LIST_KEY = None
+
+    @classmethod
+    def from_json(cls, data):
+        """
+        Build a record from a JSON object of the API
+
+        :param data: JSON object
+        """
+        record = cls.__new__(cls)
+        for attr, key, decode in cls.FIELDS:
+            value = data.get(key)
+            setattr(record, attr, decode(value) if decode is not None else value)
+        return record
+
+    @classmethod
+    def from_list(cls, data):
+        """
+        Build a list of records from a list response of the API
+
+        :param data: JSON object. E.g. `{'users': [...]}`
+        """
+        return [cls.from_json(item) for item in to_list(data, cls.LIST_KEY)]
+
+    def __eq__(self, other):
+        return type(self) is type(other) and all(
+            getattr(self, attr) == getattr(other, attr) for attr, _, _ in self.FIELDS)
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        # List fields are hashed as tuples
+        return hash((type(self),) + tuple(
+            tuple(value) if isinstance(value, list) else value
+            for value in (getattr(self, attr) for attr, _, _ in self.FIELDS)))
+
+    def __repr__(self):
+        return '<%s %r>' % (type(self).__name__, getattr(self, self.FIELDS[0][0]))
+
+
+class Property(Record):
+    __slots__ = ('key', 'value')
+    FIELDS = (
+        ('key', '@key', None),
+        ('value', '@value', None),
+    )
+    LIST_KEY = 'property'
+
+
+class User(Record):
+    __slots__ = ('username', 'name', 'email', '_properties', '_props')
+    FIELDS = (
+        ('username', 'username', None),
+        ('name', 'name', None),
+        ('email', 'email', None),
+        ('_properties', 'properties', to_pairs),
+    )
+    LIST_KEY = 'users'
+
+    @property
+    def properties(self):
+        """
+        Dictionary of user properties
+        """
+        try:
+            return self._props
+        except AttributeError:
+            self._props = dict(self._properties)
+            return self._props
+
+
+class Group(Record):
+    __slots__ = ('name', 'description', 'admins', 'members')
+    FIELDS = (
+        ('name', 'name', None),
+        ('description', 'description', None),
+        ('admins', 'admins', lambda value: to_list(value, 'admin')),
+        ('members', 'members', lambda value: to_list(value, 'member')),
+    )
+    LIST_KEY = 'groups'
+
+
+class Room(Record):
+    __slots__ = ('roomname', 'name', 'description', 'subject', 'password', 'creationdate',
+                 'modificationdate', 'maxusers', 'persistent', 'public', 'registration',
+                 'visiblejids', 'changesubject', 'anycaninvite', 'changenickname',
+                 'logenabled', 'registerednickname', 'membersonly', 'moderated',
+                 'broadcastroles', 'owners', 'admins', 'members', 'outcasts')
+    # Attribute names follow the arguments of `Muc.add_room`
+    FIELDS = (
+        ('roomname', 'roomName', None),
+        ('name', 'naturalName', None),
+        ('description', 'description', None),
+        ('subject', 'subject', None),
+        ('password', 'password', None),
+        ('creationdate', 'creationDate', None),
+        ('modificationdate', 'modificationDate', None),
+        ('maxusers', 'maxUsers', to_int),
+        ('persistent', 'persistent', to_bool),
+        ('public', 'publicRoom', to_bool),
+        ('registration', 'registrationEnabled', to_bool),
+        ('visiblejids', 'canAnyoneDiscoverJID', to_bool),
+        ('changesubject', 'canOccupantsChangeSubject', to_bool),
+        ('anycaninvite', 'canOccupantsInvite', to_bool),
+        ('changenickname', 'canChangeNickname', to_bool),
+        ('logenabled', 'logEnabled', to_bool),
+        ('registerednickname', 'loginRestrictedToNickname', to_bool),
+        ('membersonly', 'membersOnly', to_bool),
+        ('moderated', 'moderated', to_bool),
+        ('broadcastroles', 'broadcastPresenceRoles', lambda value: to_list(value, 'broadcastPresenceRole')),
+        ('owners', 'owners', lambda value: to_list(value, 'owner')),
+        ('admins', 'admins', lambda value: to_list(value, 'admin')),
+        ('members', 'members', lambda value: to_list(value, 'member')),
+        ('outcasts', 'outcasts', lambda value: to_list(value, 'outcast')),
+    )
+    LIST_KEY = 'chatRooms'
+
+
+class Session(Record):
+    __slots__ = ('sessionid', 'username', 'resource', 'node', 'status', 'presence',
+                 'presencemessage', 'priority', 'hostaddress', 'hostname',
+                 'creationdate', 'lastactiondate', 'secure')
+    FIELDS = (
+        ('sessionid', 'sessionId', None),
+        ('username', 'username', None),
+        ('resource', 'resource', None),
+        ('node', 'node', None),
+        ('status', 'sessionStatus', None),
+        ('presence', 'presenceStatus', None),
+        ('presencemessage', 'presenceMessage', None),
+        ('priority', 'priority', to_int),
+        ('hostaddress', 'hostAddress', None),
+        ('hostname', 'hostName', None),
+        ('creationdate', 'creationDate', None),
+        ('lastactiondate', 'lastActionDate', None),
+        ('secure', 'secure', to_bool),
+    )
+    LIST_KEY = 'sessions'
+
+
+class RosterItem(Record):
+    __slots__ = ('jid', 'nickname', 'subscription', 'groups')
+    FIELDS = (
+        ('jid', 'jid', None),
+        ('nickname', 'nickname', None),
+        ('subscription', 'subscriptionType', to_int),
+        ('groups', 'groups', lambda value: to_list(value, 'group')),
+    )
+    LIST_KEY = 'rosterItem'
@@ -0,0 +1,144 @@
+# -*- coding: utf-8 -*-
+import random
+import threading
+import time
+from email.utils import parsedate_tz, mktime_tz
+
+from .exception import CircuitOpenException
+
+
+def parse_retry_after(value):
+    """
+    Return the delay of a `Retry-After` header in seconds or None
+
+    :param value: Seconds or an HTTP date
+    """
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    date = parsedate_tz(value)
+    if date is None:
+        return None
+    return max(0.0, mktime_tz(date) - time.time())
+
+
+class RetryPolicy(object):
+    """
+    When and how long to wait before sending a request again
+
+    Requests are retried after connection errors and on the configured status
+    codes. The wait grows exponentially, is capped, and with jitter is drawn
+    at random below that value. A `Retry-After` header sets the minimum wait.
+    """
+
+    def __init__(self, retries=3, backoff=0.5, max_backoff=30.0, jitter=True,
+                 statuses=(429, 502, 503, 504), methods=('GET', 'PUT', 'DELETE')):
+        """
+        :param retries: (optional) Maximum number of retries of one request. Default: 3
+        :param backoff: (optional) Wait in seconds before the first retry. Doubled for every further retry. Default: 0.5
+        :param max_backoff: (optional) Maximum wait in seconds, also applied to `Retry-After`. Default: 30.0
+        :param jitter: (optional) Wait a random time up to the computed wait. Default: True
+        :param statuses: (optional) Status codes that are retried. Default: (429, 502, 503, 504)
+        :param methods: (optional) Idempotent HTTP methods that are retried. Default: ('GET', 'PUT', 'DELETE')
+        """
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.jitter = jitter
+        self.statuses = statuses
+        self.methods = methods
+
+    def allows(self, method, attempt):
+        """
+        Return True if a request may be sent again
+
+        :param method: HTTP method of the request
+        :param attempt: Number of retries done so far
+        """
+        return method in self.methods and attempt < self.retries
+
+    def delay(self, attempt, response=None):
+        """
+        Return the wait in seconds before the next retry
+
+        :param attempt: Number of retries done so far
+        :param response: (optional) Response that is retried
+        """
+        delay = min(self.max_backoff, self.backoff * (2 ** attempt))
+        if self.jitter:
+            delay = random.uniform(0, delay)
+        if response is not None:
+            retry_after = parse_retry_after(response.headers.get('Retry-After'))
+            if retry_after is not None:
+                delay = max(delay, min(retry_after, self.max_backoff))
+        return delay
+
+
+class CircuitBreaker(object):
+    """
+    Fail fast while the server is down
+
+    After `threshold` consecutive failures (connection errors or 5xx answers)
+    the circuit opens and requests raise `CircuitOpenException` without being
+    sent. After `reset_timeout` seconds one trial request is let through; its
+    success closes the circuit, its failure opens it again. A trial without an
+    outcome after another `reset_timeout` seconds is replaced by a new one.
+    Share one breaker between all clients of a host.
+    """
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half-open'
+
+    def __init__(self, threshold=5, reset_timeout=30.0):
+        """
+        :param threshold: (optional) Consecutive failures that open the circuit. Default: 5
+        :param reset_timeout: (optional) Seconds the circuit stays open before a trial request. Default: 30.0
+        """
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self._opened = 0
+        self._lock = threading.Lock()
+
+    def before(self):
+        """
+        Check that a request may be sent
+
+        :raises CircuitOpenException: The circuit is open
+        """
+        with self._lock:
+            if self.state == self.CLOSED:
+                return
+            if time.monotonic() - self._opened >= self.reset_timeout:
+                # Also when a trial never reported back, e.g. because its task was cancelled
+                self.state = self.HALF_OPEN
+                self._opened = time.monotonic()
+                return
+            raise CircuitOpenException('Circuit open after %d failures' % self.failures)
+
+    def success(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+
+    def failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.threshold:
+                self.state = self.OPEN
+                self._opened = time.monotonic()
+
+    def record(self, status_code):
+        """
+        Count a response as success or failure
+
+        :param status_code: Status code of the response
+        """
+        if status_code >= 500:
+            self.failure()
+        else:
+            self.success()
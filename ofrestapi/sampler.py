@@ -0,0 +1,246 @@
+# -*- coding: utf-8 -*-
+import threading
+import time
+
+# (seconds per bucket, number of buckets): 1 s for an hour, 1 min for a day, 1 h for 30 days
+TIERS = ((1, 3600), (60, 1440), (3600, 720))
+METRICS = ('clusterSessions', 'localSessions')
+
+
+class Series(object):
+    """
+    Fixed-size ring of time buckets keeping count, sum, minimum and maximum
+
+    A bucket index is the sample time divided by the resolution. A slot is
+    reused once the ring wraps, so the memory does not grow.
+    """
+
+    def __init__(self, resolution, size):
+        """
+        :param resolution: Seconds per bucket
+        :param size: Number of buckets
+        """
+        self.resolution = resolution
+        self.size = size
+        self._index = [None] * size
+        self._count = [0] * size
+        self._sum = [0.0] * size
+        self._min = [0.0] * size
+        self._max = [0.0] * size
+
+    def add(self, when, value):
+        """
+        Add a sample
+
+        :param when: Time of the sample
+        :param value: Number
+        """
+        index = int(when // self.resolution)
+        slot = index % self.size
+        if self._index[slot] != index:
+            self._index[slot] = index
+            self._count[slot] = 1
+            self._sum[slot] = self._min[slot] = self._max[slot] = value
+            return
+        self._count[slot] += 1
+        self._sum[slot] += value
+        if value < self._min[slot]:
+            self._min[slot] = value
+        if value > self._max[slot]:
+            self._max[slot] = value
+
+    def buckets(self, start, end):
+        """
+        Yield the buckets overlapping a time range, oldest first
+
+        :param start: Start of the range
+        :param end: End of the range
+        :return: Generator of (time, count, sum, min, max) tuples
+        """
+        last = int(end // self.resolution)
+        first = max(int(start // self.resolution), last - self.size + 1)
+        for index in range(first, last + 1):
+            slot = index % self.size
+            if self._index[slot] == index:
+                yield (index * self.resolution, self._count[slot], self._sum[slot], self._min[slot], self._max[slot])
+
+
+class SessionSampler(object):
+    """
+    Background poller of the concurrent session statistics
+
+    `get_concurrent_sessions` is called every `interval` seconds, optionally
+    together with a count of `get_sessions`. Samples go to ring buffers of
+    increasing resolution, by default 1 second for an hour, 1 minute for a day
+    and 1 hour for 30 days, so the memory is fixed. Window queries are
+    answered from memory. Use `shared` to poll once per server for the whole
+    process.
+    """
+    _shared = {}
+    _shared_lock = threading.Lock()
+
+    def __init__(self, system, sessions=None, interval=1.0, tiers=TIERS, start=True):
+        """
+        :param system: `System` client
+        :param sessions: (optional) `Sessions` client. Also sample the number of sessions as metric `sessions`. Default: None
+        :param interval: (optional) Seconds between samples. Default: 1.0
+        :param tiers: (optional) Sequence of (seconds per bucket, number of buckets), finest first. Default: `TIERS`
+        :param start: (optional) Start polling. Default: True
+        """
+        self.system = system
+        self.sessions = sessions
+        self.interval = interval
+        self.tiers = tuple(tiers)
+        self.metrics = METRICS + (('sessions',) if sessions is not None else ())
+        self.samples = 0
+        self.errors = 0
+        self.last_error = None
+        self.last = None
+        self._series = dict((metric, [Series(resolution, size) for resolution, size in self.tiers])
+                            for metric in self.metrics)
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        if start:
+            self.start()
+
+    @classmethod
+    def shared(cls, system, sessions=None, **options):
+        """
+        Return the running sampler shared by the whole process for the host/secret pair of the client
+
+        :param system: `System` client
+        :param sessions: (optional) `Sessions` client. Applied only when the sampler is created
+        :param options: (optional) Sampler options. Applied only when the sampler is created
+        """
+        key = (system.host, system.headers['Authorization'])
+        with cls._shared_lock:
+            sampler = cls._shared.get(key)
+            if sampler is None:
+                sampler = cls._shared[key] = cls(system, sessions=sessions, **options)
+            return sampler
+
+    def start(self):
+        """
+        Start polling in a background thread
+        """
+        with self._lock:
+            if self._thread is None:
+                self._stop.clear()
+                self._thread = threading.Thread(target=self._run, name='ofrestapi-sampler')
+                self._thread.daemon = True
+                self._thread.start()
+
+    def stop(self, timeout=None):
+        """
+        Stop polling
+
+        :param timeout: (optional) Maximum seconds to wait for a sample in progress. Default: None (no timeout)
+        """
+        self._stop.set()
+        thread, self._thread = self._thread, None
+        if thread is not None:
+            thread.join(timeout)
+
+    def _run(self):
+        # Samples are due on a fixed schedule, so slow requests do not make it drift
+        due = time.monotonic()
+        while not self._stop.is_set():
+            try:
+                self.sample()
+            except Exception as e:
+                with self._lock:
+                    self.errors += 1
+                    self.last_error = e
+            due += self.interval
+            now = time.monotonic()
+            if due < now:
+                # Skip the samples that were missed
+                due += (now - due) // self.interval * self.interval + self.interval
+            self._stop.wait(due - now)
+
+    def sample(self):
+        """
+        Poll the server once and record the values
+
+        :return: Dictionary of the sampled metrics
+        """
+        result = self.system.get_concurrent_sessions()
+        values = dict((metric, int(result[metric])) for metric in METRICS)
+        if self.sessions is not None:
+            values['sessions'] = sum(1 for _ in self.sessions.iter_sessions())
+        self.record(values)
+        return values
+
+    def record(self, values, when=None):
+        """
+        Add a sample
+
+        :param values: Dictionary of metric values
+        :param when: (optional) Time of the sample. Default: now
+        """
+        when = time.time() if when is None else when
+        with self._lock:
+            for metric, value in values.items():
+                for series in self._series[metric]:
+                    series.add(when, value)
+            self.samples += 1
+            self.last = (when, dict(values))
+
+    def latest(self, metric='clusterSessions'):
+        """
+        Return the last sampled value of a metric or None
+
+        :param metric: (optional) One of `clusterSessions`, `localSessions` and `sessions`. Default: `clusterSessions`
+        """
+        last = self.last
+        return last[1].get(metric) if last is not None else None
+
+    def _tier(self, metric, seconds):
+        # The finest tier that still covers the window
+        for series in self._series[metric]:
+            if series.resolution * series.size >= seconds:
+                return series
+        return self._series[metric][-1]
+
+    def window(self, seconds, metric='clusterSessions', now=None):
+        """
+        Summarize the samples of the last seconds
+
+        :param seconds: Length of the window
+        :param metric: (optional) One of `clusterSessions`, `localSessions` and `sessions`. Default: `clusterSessions`
+        :param now: (optional) End of the window. Default: now
+        :return: Dictionary with `min`, `max`, `avg` and the number of samples `count`. Values are None without samples
+        """
+        now = time.time() if now is None else now
+        count, total, low, high = 0, 0.0, None, None
+        with self._lock:
+            series = self._tier(metric, seconds)
+            for _, n, s, minimum, maximum in series.buckets(now - seconds, now):
+                count += n
+                total += s
+                low = minimum if low is None or minimum < low else low
+                high = maximum if high is None or maximum > high else high
+        return {'min': low, 'max': high, 'avg': total / count if count else None, 'count': count}
+
+    def series(self, seconds, metric='clusterSessions', resolution=None, now=None):
+        """
+        Return the buckets of the last seconds, e.g. for a chart
+
+        :param seconds: Length of the window
+        :param metric: (optional) One of `clusterSessions`, `localSessions` and `sessions`. Default: `clusterSessions`
+        :param resolution: (optional) Seconds per bucket of one of the tiers. Default: the finest tier covering the window
+        :param now: (optional) End of the window. Default: now
+        :return: List of (time, min, max, avg) tuples, oldest first. Buckets without samples are left out
+        """
+        now = time.time() if now is None else now
+        with self._lock:
+            if resolution is None:
+                series = self._tier(metric, seconds)
+            else:
+                matching = [series for series in self._series[metric] if series.resolution == resolution]
+                if not matching:
+                    raise ValueError('No tier with a resolution of %r seconds' % resolution)
+                series = matching[0]
+            return [(start, minimum, maximum, total / count)
+                    for start, count, total, minimum, maximum in series.buckets(now - seconds, now)]
@@ -1,23 +1,32 @@
 # -*- coding: utf-8 -*-
-from requests import (get, delete)
-from base import Base
+from .base import Base
+from .records import Session
 
 
 class Sessions(Base):
 
-    def __init__(self, host, secret, endpoint='/plugins/restapi/v1/sessions'):
+    def __init__(self, host, secret, endpoint='/plugins/restapi/v1/sessions', **kwargs):
         """
         :param host: Scheme://Host/ for API requests
         :param secret: Shared secret key for API requests
         :param endpoint: Endpoint for API requests
+        :param kwargs: (optional) Client options. See `Base`
         """
-        super(Sessions, self).__init__(host, secret, endpoint)
+        super(Sessions, self).__init__(host, secret, endpoint, **kwargs)
 
     def get_sessions(self):
         """
         Retrieve sessions of all users
         """
-        return self._submit_request(get, self.endpoint)
+        return self._submit_request('GET', self.endpoint, record=Session.from_list, template='/sessions')
+
+    def iter_sessions(self):
+        """
+        Iterate over sessions of all users
+
+        The response is streamed and sessions are yielded one at a time.
+        """
+        return self._iter_request('GET', self.endpoint, record=Session.from_json, template='/sessions')
 
     def get_user_sessions(self, username):
         """
@@ -26,7 +35,7 @@ class Sessions(Base):
         :param username: The user name
         """
         endpoint = '/'.join([self.endpoint, username])
-        return self._submit_request(get, endpoint)
+        return self._submit_request('GET', endpoint, record=Session.from_list, template='/sessions/{username}')
 
     def close_user_sessions(self, username):
         """
@@ -35,4 +44,4 @@ class Sessions(Base):
         :param username: The user name
         """
         endpoint = '/'.join([self.endpoint, username])
-        return self._submit_request(delete, endpoint)
+        return self._submit_request('DELETE', endpoint, template='/sessions/{username}')
@@ -0,0 +1,118 @@
+# -*- coding: utf-8 -*-
+import asyncio
+import threading
+
+
+class _Call(object):
+    __slots__ = ('event', 'result', 'error')
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight(object):
+    """
+    Share one request between identical concurrent GET calls
+
+    While a GET request is in flight, every identical call (same secret,
+    host, endpoint and parameters) waits for it and receives its result or
+    exception instead of sending its own request. Nothing is kept once the
+    request completes, so results are never stale. Works for threads and for
+    asyncio tasks; calls of different event loops are not shared.
+    """
+
+    def __init__(self):
+        self.calls = 0
+        self.collapsed = 0
+        self._calls = {}
+        self._tasks = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(secret, host, endpoint, params=None):
+        """
+        Build the key of a request
+
+        :param secret: Shared secret key of the client
+        :param host: Scheme://Host/ of the request
+        :param endpoint: Plugin endpoint of the request
+        :param params: (optional) Query parameters of the request
+        """
+        if params:
+            params = tuple(sorted((key, value) for key, value in params.items() if value is not None))
+        return (secret, host, endpoint, params or ())
+
+    def call(self, key, func):
+        """
+        Call `func`, or wait for the identical call in flight
+
+        :param key: Key from `make_key`
+        :param func: Function sending the request
+        :return: Result of `func`
+        """
+        with self._lock:
+            self.calls += 1
+            call = self._calls.get(key)
+            if call is None:
+                call = self._calls[key] = _Call()
+                leader = True
+            else:
+                self.collapsed += 1
+                leader = False
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+        try:
+            call.result = func()
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.event.set()
+        return call.result
+
+    async def call_async(self, key, func):
+        """
+        Await `func`, or the identical call in flight
+
+        The request runs in its own task, so a cancelled caller does not
+        cancel it for the others.
+
+        :param key: Key from `make_key`
+        :param func: Coroutine function sending the request
+        :return: Result of `func`
+        """
+        loop = asyncio.get_running_loop()
+        task_key = (loop, key)
+        with self._lock:
+            self.calls += 1
+            task = self._tasks.get(task_key)
+            if task is None:
+                task = self._tasks[task_key] = loop.create_task(func())
+                task.add_done_callback(lambda _: self._done(task_key))
+            else:
+                self.collapsed += 1
+        return await asyncio.shield(task)
+
+    def _done(self, task_key):
+        with self._lock:
+            self._tasks.pop(task_key, None)
+
+    def stats(self):
+        """
+        Return call counters
+
+        :return: Dictionary with `calls`, `collapsed` calls that shared a request and requests `in_flight`
+        """
+        with self._lock:
+            return {
+                'calls': self.calls,
+                'collapsed': self.collapsed,
+                'in_flight': len(self._calls) + len(self._tasks),
+            }
@@ -0,0 +1,121 @@
+# -*- coding: utf-8 -*-
+import time
+
+from .records import Session
+
+
+def _session(item):
+    return Session.from_json(item) if isinstance(item, dict) else item
+
+
+class SessionSnapshot(object):
+    """
+    In-memory view of all sessions built from a single `get_sessions` call
+
+    Sessions are indexed by username, resource, node, host name, presence and
+    priority, so lookups and per-field counts need no further requests.
+    """
+    INDEXES = ('username', 'resource', 'node', 'hostname', 'presence', 'priority')
+
+    def __init__(self, sessions=(), taken=None):
+        """
+        :param sessions: (optional) Iterable of `Session` records or JSON objects
+        :param taken: (optional) Time of the snapshot. Default: now
+        """
+        self.taken = taken if taken is not None else time.time()
+        self.sessions = {}
+        self._indexes = dict((field, {}) for field in self.INDEXES)
+        for item in sessions:
+            self._add(_session(item))
+
+    @classmethod
+    def load(cls, sessions, stream=True):
+        """
+        Take a snapshot of all sessions
+
+        :param sessions: `Sessions` client
+        :param stream: (optional) Stream the response with `iter_sessions`. Default: True
+        """
+        if stream:
+            return cls(sessions.iter_sessions())
+        result = sessions.get_sessions()
+        return cls(result if isinstance(result, list) else Session.from_list(result))
+
+    @staticmethod
+    def key(session):
+        """
+        Return the identity of a session
+
+        :param session: `Session` record
+        """
+        return session.sessionid or (session.username, session.resource, session.node)
+
+    def _add(self, session):
+        self.sessions[self.key(session)] = session
+        for field, index in self._indexes.items():
+            index.setdefault(getattr(session, field), []).append(session)
+
+    def find(self, field, value):
+        """
+        Return the sessions whose field has a value
+
+        :param field: One of INDEXES
+        :param value: The value. E.g. a user name for `username`
+        :return: List of `Session`
+        """
+        return self._indexes[field].get(value, [])
+
+    def user_sessions(self, username):
+        """
+        Return the sessions of a user
+
+        :param username: The user name
+        :return: List of `Session`
+        """
+        return self._indexes['username'].get(username, [])
+
+    def is_online(self, username):
+        """
+        Return True if the user has at least one session
+
+        :param username: The user name
+        """
+        return username in self._indexes['username']
+
+    def count_by(self, field):
+        """
+        Count sessions per value of a field
+
+        :param field: One of INDEXES
+        :return: Dictionary of value to number of sessions
+        """
+        return dict((value, len(sessions)) for value, sessions in self._indexes[field].items())
+
+    def diff(self, previous):
+        """
+        Compare with an older snapshot
+
+        :param previous: The older `SessionSnapshot`
+        :return: Tuple of (joined, left) lists of `Session`
+        """
+        joined = [session for key, session in self.sessions.items() if key not in previous.sessions]
+        left = [session for key, session in previous.sessions.items() if key not in self.sessions]
+        return joined, left
+
+    def refresh(self, sessions, stream=True):
+        """
+        Take a new snapshot and compare it with this one
+
+        :param sessions: `Sessions` client
+        :param stream: (optional) Stream the response with `iter_sessions`. Default: True
+        :return: Tuple of (new snapshot, joined, left)
+        """
+        snapshot = self.load(sessions, stream=stream)
+        joined, left = snapshot.diff(self)
+        return snapshot, joined, left
+
+    def __len__(self):
+        return len(self.sessions)
+
+    def __iter__(self):
+        return iter(self.sessions.values())
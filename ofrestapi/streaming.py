@@ -0,0 +1,125 @@
+# -*- coding: utf-8 -*-
+import codecs
+import json
+import re
+
+WHITESPACE = re.compile(r'[ \t\n\r]*')
+NUMBER_END = ',]} \t\n\r'
+
+
+class ItemParser(object):
+    """
+    Incremental parser for list responses such as `{"users": [{...}, {...}]}`
+
+    Bytes are fed as they arrive and every record of the list is returned as
+    soon as it is complete, so only one record at a time is held in memory.
+    A single record that is not wrapped in a list is returned as well.
+    """
+    START = 0
+    ARRAY = 1
+    VALUE = 2
+    DONE = 3
+
+    def __init__(self, encoding='utf-8'):
+        """
+        :param encoding: (optional) Encoding of the response body. Default: `utf-8`
+        """
+        self._decoder = json.JSONDecoder()
+        self._text = codecs.getincrementaldecoder(encoding)()
+        self._buf = ''
+        self._pos = 0
+        self._state = self.START
+
+    @property
+    def done(self):
+        return self._state == self.DONE
+
+    def feed(self, data):
+        """
+        Parse the next chunk of the body
+
+        :param data: Bytes of the body
+        :return: List of completed records
+        """
+        self._buf = self._buf[self._pos:] + self._text.decode(data)
+        self._pos = 0
+        items = []
+        while self._state != self.DONE and self._step(items):
+            pass
+        return items
+
+    def _skip(self):
+        self._pos = WHITESPACE.match(self._buf, self._pos).end()
+        return self._pos < len(self._buf)
+
+    def _decode(self):
+        try:
+            value, end = self._decoder.raw_decode(self._buf, self._pos)
+        except ValueError:
+            return False, None
+        if isinstance(value, (int, float)) and not isinstance(value, bool) and (
+                end == len(self._buf) or self._buf[end] not in NUMBER_END):
+            # A number cut by the end of the chunk, e.g. `22` read as `2` or
+            # `-4.5` read as `-4`, goes on in the next chunk. Inside the wrapper
+            # object a complete number is always followed by one of NUMBER_END
+            return False, None
+        self._pos = end
+        return True, value
+
+    def _step(self, items):
+        """
+        Advance the parser by one token
+
+        :return: False when more data is needed
+        """
+        if not self._skip():
+            return False
+        if self._state == self.START:
+            # Opening brace and the key of the wrapper object
+            start = self._pos
+            if self._buf[self._pos] != '{':
+                raise ValueError('Expected an object at position %d' % self._pos)
+            self._pos += 1
+            if not self._skip():
+                self._pos = start
+                return False
+            if self._buf[self._pos] == '}':
+                self._state = self.DONE
+                return False
+            found, _ = self._decode()
+            if not found or not self._skip():
+                self._pos = start
+                return False
+            if self._buf[self._pos] != ':':
+                raise ValueError('Expected a colon at position %d' % self._pos)
+            self._pos += 1
+            if not self._skip():
+                self._pos = start
+                return False
+            if self._buf[self._pos] == '[':
+                self._pos += 1
+                self._state = self.ARRAY
+            else:
+                self._state = self.VALUE
+            return True
+        if self._state == self.VALUE:
+            found, value = self._decode()
+            if not found:
+                return False
+            if value is not None:
+                items.append(value)
+            self._state = self.DONE
+            return False
+        char = self._buf[self._pos]
+        if char == ']':
+            self._pos += 1
+            self._state = self.DONE
+            return False
+        if char == ',':
+            self._pos += 1
+            return True
+        found, value = self._decode()
+        if not found:
+            return False
+        items.append(value)
+        return True
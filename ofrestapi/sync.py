@@ -0,0 +1,385 @@
+# -*- coding: utf-8 -*-
+from .bulk import BulkResult, RateLimiter, run_bulk
+from .records import Group, RosterItem, Room
+
+# Arguments of `Muc.add_room` and `Muc.update_room` describing a room
+ROOM_FIELDS = ('name', 'description', 'subject', 'password', 'maxusers', 'persistent', 'public',
+               'registration', 'visiblejids', 'changesubject', 'anycaninvite', 'changenickname',
+               'logenabled', 'registerednickname', 'membersonly', 'moderated', 'broadcastroles',
+               'owners', 'admins', 'members', 'outcasts')
+LIST_FIELDS = ('broadcastroles', 'owners', 'admins', 'members', 'outcasts')
+# Roles of `Muc.grant_user_role`. A user has at most one of them in a room
+AFFILIATIONS = ('owners', 'admins', 'members', 'outcasts')
+
+
+class Change(object):
+    """
+    One planned write of a synchronization
+    """
+    __slots__ = ('action', 'key', 'fields', 'current', 'desired', '_func', '_args', '_kwargs')
+
+    ADD = 'add'
+    UPDATE = 'update'
+    REMOVE = 'remove'
+
+    def __init__(self, action, key, fields, current, desired, func, *args, **kwargs):
+        """
+        :param action: One of ADD, UPDATE, REMOVE
+        :param key: Identifier of the changed entity. E.g. a JID
+        :param fields: Names of the changed fields
+        :param current: Current state or None
+        :param desired: Desired state or None
+        :param func: Client method applying the change
+        :param args: Positional arguments of `func`
+        :param kwargs: Keyword arguments of `func`
+        """
+        self.action = action
+        self.key = key
+        self.fields = fields
+        self.current = current
+        self.desired = desired
+        self._func = func
+        self._args = args
+        self._kwargs = kwargs
+
+    def apply(self):
+        """
+        Send the write to the server
+        """
+        return self._func(*self._args, **self._kwargs)
+
+    def __repr__(self):
+        return '<Change %s %r %s>' % (self.action, self.key, ','.join(self.fields))
+
+
+def apply_changes(changes, workers=8, rate=None, progress=None, group=None):
+    """
+    Apply planned changes concurrently
+
+    :param changes: Iterable of `Change`
+    :param workers: (optional) Number of concurrent writes. Default: 8
+    :param rate: (optional) Maximum number of writes started per second. Default: None (unlimited)
+    :param progress: (optional) Function called with (done, total, result) after every write
+    :param group: (optional) Function returning the group of a change. Changes of one group are applied one at a time, in order. Default: None (all changes are independent)
+    :return: List of `BulkResult` whose items are the changes, in the order of the changes
+    """
+    changes = list(changes)
+    results = []
+    if group is None:
+        bulk = run_bulk(lambda change: (BulkResult.OK, change.apply()), changes, workers=workers, rate=rate)
+    else:
+        bulk = _run_groups(changes, group, workers, rate)
+    for result in bulk:
+        results.append(result)
+        if progress is not None:
+            progress(len(results), len(changes), result)
+    return sorted(results, key=lambda result: result.index)
+
+
+def _run_groups(changes, group, workers, rate):
+    """
+    Apply groups of changes concurrently and the changes of each group in order
+
+    :return: Generator of `BulkResult` of the changes
+    """
+    groups = {}
+    for index, change in enumerate(changes):
+        groups.setdefault(group(change), []).append((index, change))
+    limiter = RateLimiter(rate) if rate else None
+
+    def apply_group(items):
+        results = []
+        for index, change in items:
+            if limiter:
+                limiter.wait()
+            try:
+                results.append(BulkResult(index, change, BulkResult.OK, change.apply()))
+            except Exception as e:
+                results.append(BulkResult(index, change, BulkResult.FAILED, error=e))
+        return BulkResult.OK, results
+
+    for result in run_bulk(apply_group, groups.values(), workers=workers):
+        for change_result in result.result:
+            yield change_result
+
+
+def _roster_items(result):
+    if isinstance(result, list):
+        return result
+    return RosterItem.from_list(result)
+
+
+def plan_roster(users, username, desired, remove=True):
+    """
+    Compute the minimal changes turning the roster of a user into the desired one
+
+    :param users: `Users` client
+    :param username: The user name
+    :param desired: Iterable of dictionaries with the keys `jid` and optionally `name`, `subscription` and `groups`. Fields set to None are left as they are
+    :param remove: (optional) Remove roster items missing from `desired`. Default: True
+    :return: List of `Change` keyed by JID
+    """
+    current = dict((item.jid, item) for item in _roster_items(users.get_user_roster(username)))
+    changes = []
+    seen = set()
+    for entry in desired:
+        jid = entry['jid']
+        seen.add(jid)
+        name = entry.get('name')
+        subscription = entry.get('subscription')
+        groups = entry.get('groups')
+        item = current.get(jid)
+        if item is None:
+            changes.append(Change(Change.ADD, jid, ('name', 'subscription', 'groups'), None, entry,
+                                  users.add_user_roster_item, username, jid,
+                                  name=name, subscription=subscription, groups=groups))
+            continue
+        fields = []
+        if name is not None and name != item.nickname:
+            fields.append('name')
+        if subscription is not None and subscription != item.subscription:
+            fields.append('subscription')
+        if groups is not None and sorted(groups) != sorted(item.groups):
+            fields.append('groups')
+        if fields:
+            changes.append(Change(Change.UPDATE, jid, tuple(fields), item, entry,
+                                  users.update_user_roster_item, username, jid,
+                                  name=name if name is not None else item.nickname,
+                                  subscription=subscription if subscription is not None else item.subscription,
+                                  groups=groups if groups is not None else item.groups))
+    if remove:
+        for jid, item in current.items():
+            if jid not in seen:
+                changes.append(Change(Change.REMOVE, jid, (), item, None,
+                                      users.delete_user_roster_item, username, jid))
+    return changes
+
+
+def sync_roster(users, username, desired, remove=True, workers=8, dry_run=False):
+    """
+    Synchronize the roster of a user with the desired one
+
+    Only roster items that differ are written, concurrently.
+
+    :param users: `Users` client
+    :param username: The user name
+    :param desired: Iterable of dictionaries with the keys `jid` and optionally `name`, `subscription` and `groups`. Fields set to None are left as they are
+    :param remove: (optional) Remove roster items missing from `desired`. Default: True
+    :param workers: (optional) Number of concurrent writes. Default: 8
+    :param dry_run: (optional) Only compute the changes. Default: False
+    :return: List of `Change` when `dry_run` is set, otherwise list of `BulkResult` whose items are the changes
+    """
+    changes = plan_roster(users, username, desired, remove=remove)
+    if dry_run:
+        return changes
+    return apply_changes(changes, workers=workers)
+
+
+def plan_rooms(muc, desired, servicename='conference', delete=False):
+    """
+    Compute the minimal changes turning the chat rooms of a service into the desired ones
+
+    All rooms are fetched with one `get_rooms` call. Only the fields given in a
+    desired room are compared. An update sends the current value of every
+    other field, so settings that are not mentioned are kept.
+
+    :param muc: `Muc` client
+    :param desired: Iterable of dictionaries with the key `roomname` and any other argument of `Muc.add_room`
+    :param servicename: (optional) The name of the Group Chat Service. Default: `conference`
+    :param delete: (optional) Delete rooms missing from `desired`. Default: False
+    :return: List of `Change` keyed by room name
+    """
+    result = muc.get_rooms(servicename=servicename, typeof='all')
+    rooms = result if isinstance(result, list) else Room.from_list(result)
+    current = dict((room.roomname, room) for room in rooms)
+    changes = []
+    seen = set()
+    for entry in desired:
+        roomname = entry['roomname']
+        seen.add(roomname)
+        fields = dict((field, entry[field]) for field in ROOM_FIELDS if field in entry)
+        room = current.get(roomname)
+        if room is None:
+            added = tuple(sorted(fields))
+            name = fields.pop('name', roomname)
+            description = fields.pop('description', '')
+            changes.append(Change(Change.ADD, roomname, added, None, entry,
+                                  muc.add_room, roomname, name, description, servicename=servicename, **fields))
+            continue
+        changed = []
+        for field, value in fields.items():
+            old = getattr(room, field)
+            if field in LIST_FIELDS:
+                if sorted(value or []) != sorted(old or []):
+                    changed.append(field)
+            elif value != old:
+                changed.append(field)
+        if not changed:
+            continue
+        kwargs = {}
+        for field in ROOM_FIELDS:
+            value = getattr(room, field)
+            if value is not None and value != []:
+                kwargs[field] = value
+        kwargs.update(fields)
+        changes.append(Change(Change.UPDATE, roomname, tuple(sorted(changed)), room, entry,
+                              muc.update_room, roomname, servicename=servicename, **kwargs))
+    if delete:
+        for roomname, room in current.items():
+            if roomname not in seen:
+                changes.append(Change(Change.REMOVE, roomname, (), room, None,
+                                      muc.delete_room, roomname, servicename=servicename))
+    return changes
+
+
+def sync_rooms(muc, desired, servicename='conference', delete=False, workers=8, dry_run=False):
+    """
+    Synchronize the chat rooms of a service with the desired ones
+
+    Only rooms that are missing or differ are written, concurrently.
+
+    :param muc: `Muc` client
+    :param desired: Iterable of dictionaries with the key `roomname` and any other argument of `Muc.add_room`
+    :param servicename: (optional) The name of the Group Chat Service. Default: `conference`
+    :param delete: (optional) Delete rooms missing from `desired`. Default: False
+    :param workers: (optional) Number of concurrent writes. Default: 8
+    :param dry_run: (optional) Only compute the changes. Default: False
+    :return: List of `Change` when `dry_run` is set, otherwise list of `BulkResult` whose items are the changes
+    """
+    changes = plan_rooms(muc, desired, servicename=servicename, delete=delete)
+    if dry_run:
+        return changes
+    return apply_changes(changes, workers=workers)
+
+
+def _member_name(member):
+    # Members may be reported as bare JIDs
+    return member.partition('@')[0]
+
+
+def plan_group_members(users, groups, groupname, members=None, add=(), remove=()):
+    """
+    Compute the minimal changes to the membership of a group
+
+    Either give the complete member list with `members`, or the users to add
+    and to remove. Users that already are (or are not) members are skipped.
+
+    :param users: `Users` client applying the changes
+    :param groups: `Groups` client reading the current members
+    :param groupname: The exact group name
+    :param members: (optional) User names of all desired members. Default: None (use `add` and `remove`)
+    :param add: (optional) User names to add to the group
+    :param remove: (optional) User names to remove from the group
+    :return: List of `Change` keyed by user name
+    """
+    result = groups.get_group(groupname)
+    group = Group.from_json(result) if isinstance(result, dict) else result
+    current = set(_member_name(member) for member in group.members or [])
+    if members is not None:
+        members = list(members)
+        wanted = set(members)
+        add = [username for username in members if username not in current]
+        remove = sorted(username for username in current if username not in wanted)
+    changes = []
+    seen = set()
+    for username in add:
+        if username not in current and username not in seen:
+            seen.add(username)
+            changes.append(Change(Change.ADD, username, ('groups',), None, groupname,
+                                  users.add_user_groups, username, [groupname]))
+    for username in remove:
+        if username in current and username not in seen:
+            seen.add(username)
+            changes.append(Change(Change.REMOVE, username, ('groups',), groupname, None,
+                                  users.delete_user_groups, username, [groupname]))
+    return changes
+
+
+def sync_group_members(users, groups, groupname, members=None, add=(), remove=(), workers=8, rate=None,
+                       progress=None, dry_run=False):
+    """
+    Set, add or remove the members of a group
+
+    Only users whose membership changes are written, concurrently. Running
+    the same call again after a partial failure retries only what is left.
+
+    :param users: `Users` client applying the changes
+    :param groups: `Groups` client reading the current members
+    :param groupname: The exact group name
+    :param members: (optional) User names of all desired members. Default: None (use `add` and `remove`)
+    :param add: (optional) User names to add to the group
+    :param remove: (optional) User names to remove from the group
+    :param workers: (optional) Number of concurrent writes. Default: 8
+    :param rate: (optional) Maximum number of writes started per second. Default: None (unlimited)
+    :param progress: (optional) Function called with (done, total, result) after every write
+    :param dry_run: (optional) Only compute the changes. Default: False
+    :return: List of `Change` when `dry_run` is set, otherwise list of `BulkResult` whose items are the changes
+    """
+    changes = plan_group_members(users, groups, groupname, members=members, add=add, remove=remove)
+    if dry_run:
+        return changes
+    return apply_changes(changes, workers=workers, rate=rate, progress=progress)
+
+
+def plan_affiliations(muc, desired, servicename='conference'):
+    """
+    Compute the minimal grants and revocations turning the affiliations of chat rooms into the desired ones
+
+    All rooms are fetched with one `get_rooms` call. Only the roles given in a
+    desired room are managed: users holding one of them who are not desired in
+    any role are revoked. A user moving to another role is only granted the
+    new one, as the server replaces the old affiliation.
+
+    :param muc: `Muc` client
+    :param desired: Iterable of dictionaries with the key `roomname` and any of `owners`, `admins`, `members` and `outcasts` mapped to lists of JIDs
+    :param servicename: (optional) The name of the Group Chat Service. Default: `conference`
+    :return: List of `Change` keyed by (room name, JID). Revocations of a room come before its grants
+    """
+    result = muc.get_rooms(servicename=servicename, typeof='all')
+    rooms = result if isinstance(result, list) else Room.from_list(result)
+    current = dict((room.roomname, room) for room in rooms)
+    changes = []
+    for entry in desired:
+        roomname = entry['roomname']
+        room = current.get(roomname)
+        managed = [role for role in AFFILIATIONS if role in entry]
+        wanted = {}
+        for role in managed:
+            for jid in entry[role] or []:
+                wanted[jid] = role
+        have = {}
+        if room is not None:
+            for role in AFFILIATIONS:
+                for jid in getattr(room, role) or []:
+                    have[jid] = role
+        for jid, role in have.items():
+            if role in managed and jid not in wanted:
+                changes.append(Change(Change.REMOVE, (roomname, jid), (role,), role, None,
+                                      muc.revoke_user_role, roomname, jid, role, servicename=servicename))
+        for jid, role in wanted.items():
+            if have.get(jid) != role:
+                changes.append(Change(Change.ADD, (roomname, jid), (role,), have.get(jid), role,
+                                      muc.grant_user_role, roomname, jid, role, servicename=servicename))
+    return changes
+
+
+def sync_affiliations(muc, desired, servicename='conference', workers=8, rate=None, progress=None, dry_run=False):
+    """
+    Synchronize the owners, admins, members and outcasts of chat rooms
+
+    Only differing affiliations are written. Rooms are processed concurrently,
+    the writes of one room one at a time in order.
+
+    :param muc: `Muc` client
+    :param desired: Iterable of dictionaries with the key `roomname` and any of `owners`, `admins`, `members` and `outcasts` mapped to lists of JIDs
+    :param servicename: (optional) The name of the Group Chat Service. Default: `conference`
+    :param workers: (optional) Number of rooms written concurrently. Default: 8
+    :param rate: (optional) Maximum number of writes started per second. Default: None (unlimited)
+    :param progress: (optional) Function called with (done, total, result) after every write
+    :param dry_run: (optional) Only compute the changes. Default: False
+    :return: List of `Change` when `dry_run` is set, otherwise list of `BulkResult` whose items are the changes
+    """
+    changes = plan_affiliations(muc, desired, servicename=servicename)
+    if dry_run:
+        return changes
+    return apply_changes(changes, workers=workers, rate=rate, progress=progress, group=lambda change: change.key[0])
@@ -1,23 +1,26 @@
 # -*- coding: utf-8 -*-
-from requests import (get, post, delete)
-from base import Base
+from .base import Base
+from .records import Property
 
 
 class System(Base):
+    # `PropertyMirror` updated by the writes of this client
+    mirror = None
 
-    def __init__(self, host, secret, endpoint='/plugins/restapi/v1/system/properties'):
+    def __init__(self, host, secret, endpoint='/plugins/restapi/v1/system/properties', **kwargs):
         """
         :param host: Scheme://Host/ for API requests
         :param secret: Shared secret key for API requests
         :param endpoint: Endpoint for API requests
+        :param kwargs: (optional) Client options. See `Base`
         """
-        super(System, self).__init__(host, secret, endpoint)
+        super(System, self).__init__(host, secret, endpoint, **kwargs)
 
     def get_props(self):
         """
         Retrieve all system properties
         """
-        return self._submit_request(get, self.endpoint)
+        return self._submit_request('GET', self.endpoint, record=Property.from_list, template='/system/properties')
 
     def get_prop(self, key):
         """
@@ -26,7 +29,7 @@ class System(Base):
         :param key: The name of system property
         """
         endpoint = '/'.join([self.endpoint, key])
-        return self._submit_request(get, endpoint)
+        return self._submit_request('GET', endpoint, record=Property.from_json, template='/system/properties/{key}')
 
     def update_prop(self, key, value):
         """
@@ -39,7 +42,8 @@ class System(Base):
             '@key': key,
             '@value': value,
         }
-        return self._submit_request(post, self.endpoint, json=payload)
+        result = self._submit_request('POST', self.endpoint, json=payload, template='/system/properties')
+        return self._mirror_write(result, key, value)
 
     def delete_prop(self, key):
         """
@@ -48,11 +52,17 @@ class System(Base):
         :param key: The name of system property
         """
         endpoint = '/'.join([self.endpoint, key])
-        return self._submit_request(delete, endpoint)
+        result = self._submit_request('DELETE', endpoint, template='/system/properties/{key}')
+        return self._mirror_write(result, key, None)
+
+    def _mirror_write(self, result, key, value):
+        if self.mirror is not None:
+            self.mirror._written(key, value)
+        return result
 
     def get_concurrent_sessions(self):
         """
         Retrieve concurrent sessions
         """
         endpoint = '/'.join([self.endpoint.rpartition('/')[0], 'statistics', 'sessions'])
-        return self._submit_request(get, endpoint)
+        return self._submit_request('GET', endpoint, template='/system/statistics/sessions')
@@ -0,0 +1,173 @@
+# -*- coding: utf-8 -*-
+import asyncio
+import threading
+import time
+from collections import deque
+
+
+class Budget(object):
+    """
+    Token bucket and in-flight limit for one class of requests
+
+    A budget can be shared by threads and asyncio tasks at the same time.
+    Requests waiting for a free in-flight slot are served in arrival order.
+    """
+
+    def __init__(self, rate=None, burst=None, max_in_flight=None):
+        """
+        :param rate: (optional) Maximum number of requests per second. Default: None (unlimited)
+        :param burst: (optional) Number of requests that may be sent at once after an idle period. Default: `rate`
+        :param max_in_flight: (optional) Maximum number of concurrent requests. Default: None (unlimited)
+        """
+        self.rate = rate
+        self.burst = burst if burst is not None else max(1, rate or 1)
+        self.max_in_flight = max_in_flight
+        self.in_flight = 0
+        self.count = 0
+        self.waited = 0.0
+        self.max_wait = 0.0
+        self._tokens = self.burst
+        self._stamp = time.monotonic()
+        self._waiters = deque()
+        self._lock = threading.Lock()
+
+    def _reserve(self):
+        """
+        Take a token and return the seconds until it is available
+        """
+        if not self.rate:
+            return 0.0
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._stamp) * self.rate)
+            self._stamp = now
+            self._tokens -= 1
+            if self._tokens >= 0:
+                return 0.0
+            return -self._tokens / self.rate
+
+    def _enter(self, waiter):
+        """
+        Take an in-flight slot, or queue `waiter` to be called when one is handed over
+
+        :return: True if a slot was taken
+        """
+        with self._lock:
+            if self.max_in_flight is None or (self.in_flight < self.max_in_flight and not self._waiters):
+                self.in_flight += 1
+                return True
+            self._waiters.append(waiter)
+            return False
+
+    def _record(self, waited):
+        with self._lock:
+            self.count += 1
+            self.waited += waited
+            if waited > self.max_wait:
+                self.max_wait = waited
+
+    def acquire(self):
+        """
+        Wait until a request may be sent
+
+        :return: Seconds spent waiting
+        """
+        start = time.monotonic()
+        delay = self._reserve()
+        if delay:
+            time.sleep(delay)
+        event = threading.Event()
+        if not self._enter(event.set):
+            event.wait()
+        waited = time.monotonic() - start
+        self._record(waited)
+        return waited
+
+    async def acquire_async(self):
+        """
+        Wait until a request may be sent, without blocking the event loop
+
+        :return: Seconds spent waiting
+        """
+        start = time.monotonic()
+        delay = self._reserve()
+        if delay:
+            await asyncio.sleep(delay)
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+
+        def wake():
+            if future.done():
+                # The waiting task was cancelled, pass the slot on
+                self.release()
+            else:
+                future.set_result(None)
+        if not self._enter(lambda: loop.call_soon_threadsafe(wake)):
+            await future
+        waited = time.monotonic() - start
+        self._record(waited)
+        return waited
+
+    def release(self):
+        """
+        Free the in-flight slot of a completed request
+        """
+        with self._lock:
+            if self._waiters:
+                wake = self._waiters.popleft()
+            else:
+                self.in_flight -= 1
+                return
+        wake()
+
+    def stats(self):
+        """
+        Return queue counters
+
+        :return: Dictionary with `in_flight`, `queued`, `count`, `wait_mean` and `wait_max` in seconds
+        """
+        with self._lock:
+            return {
+                'in_flight': self.in_flight,
+                'queued': len(self._waiters),
+                'count': self.count,
+                'wait_mean': self.waited / self.count if self.count else 0.0,
+                'wait_max': self.max_wait,
+            }
+
+
+class Throttle(object):
+    """
+    Client-side rate and concurrency limits with separate budgets for reads and writes
+
+    Share one throttle between all clients of a host to keep the total load
+    below what the server can take.
+    """
+    READ_METHODS = ('GET', 'HEAD')
+
+    def __init__(self, reads=None, writes=None):
+        """
+        :param reads: (optional) `Budget` for GET requests. Default: None (unlimited)
+        :param writes: (optional) `Budget` for POST, PUT and DELETE requests. Default: None (unlimited)
+        """
+        self.reads = reads
+        self.writes = writes
+
+    def budget(self, method):
+        """
+        Return the budget of an HTTP method or None
+
+        :param method: HTTP method. E.g. `GET`
+        """
+        return self.reads if method in self.READ_METHODS else self.writes
+
+    def stats(self):
+        """
+        Return queue counters of both budgets
+
+        :return: Dictionary with `reads` and `writes` counters from `Budget.stats`
+        """
+        return {
+            'reads': self.reads.stats() if self.reads is not None else None,
+            'writes': self.writes.stats() if self.writes is not None else None,
+        }
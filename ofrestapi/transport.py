@@ -0,0 +1,153 @@
+# -*- coding: utf-8 -*-
+import threading
+from time import perf_counter
+
+from requests import Session
+from requests.adapters import HTTPAdapter
+from requests import exceptions
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+# Seconds spent opening connections by the current thread
+_timing = threading.local()
+
+
+class TimedHTTPConnection(HTTPConnection):
+
+    def connect(self):
+        start = perf_counter()
+        try:
+            super(TimedHTTPConnection, self).connect()
+        finally:
+            _timing.connect = getattr(_timing, 'connect', 0.0) + perf_counter() - start
+
+
+class TimedHTTPSConnection(HTTPSConnection):
+
+    def connect(self):
+        start = perf_counter()
+        try:
+            super(TimedHTTPSConnection, self).connect()
+        finally:
+            _timing.connect = getattr(_timing, 'connect', 0.0) + perf_counter() - start
+
+
+class TimedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = TimedHTTPConnection
+
+
+class TimedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = TimedHTTPSConnection
+
+
+class Transport(object):
+    """
+    Pooled HTTP transport shared by API clients
+
+    A transport owns one connection pool. Every thread gets its own
+    `requests.Session`, but all of them are mounted on the same adapter, so
+    keep-alive connections are reused across threads and endpoint classes.
+    """
+    _shared = {}
+    _shared_lock = threading.Lock()
+    # Errors raised when the server could not be reached or did not answer
+    connection_errors = (exceptions.ConnectionError, exceptions.Timeout)
+
+    def __init__(self, pool_connections=10, pool_maxsize=10, pool_block=False,
+                 keep_alive=True, connect_timeout=None, read_timeout=None):
+        """
+        :param pool_connections: (optional) Number of per-host pools to keep. Default: 10
+        :param pool_maxsize: (optional) Maximum number of connections kept per host. Default: 10
+        :param pool_block: (optional) Wait for a free connection instead of opening an extra one when a host pool is exhausted. Default: False
+        :param keep_alive: (optional) Keep connections open between requests. Default: True
+        :param connect_timeout: (optional) Seconds to wait for a connection to be established. Default: None (no timeout)
+        :param read_timeout: (optional) Seconds to wait for the server to send a response. Default: None (no timeout)
+        """
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        self.pool_block = pool_block
+        self.keep_alive = keep_alive
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.adapter = HTTPAdapter(pool_connections=pool_connections,
+                                   pool_maxsize=pool_maxsize,
+                                   pool_block=pool_block)
+        self.adapter.poolmanager.pool_classes_by_scheme = {
+            'http': TimedHTTPConnectionPool,
+            'https': TimedHTTPSConnectionPool,
+        }
+        self._local = threading.local()
+
+    @classmethod
+    def shared(cls, host, secret, **options):
+        """
+        Return the transport shared by all clients of the host/secret pair
+
+        :param host: Scheme://Host/ for API requests
+        :param secret: Shared secret key for API requests
+        :param options: (optional) Pool options. Applied only when the transport is created
+        """
+        key = (host, secret)
+        with cls._shared_lock:
+            transport = cls._shared.get(key)
+            if transport is None:
+                transport = cls._shared[key] = cls(**options)
+            return transport
+
+    @property
+    def session(self):
+        """
+        Session of the current thread
+        """
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = Session()
+            session.mount('http://', self.adapter)
+            session.mount('https://', self.adapter)
+            if not self.keep_alive:
+                session.headers['Connection'] = 'close'
+            self._local.session = session
+        return session
+
+    @property
+    def timeout(self):
+        if self.connect_timeout is None and self.read_timeout is None:
+            return None
+        return (self.connect_timeout, self.read_timeout)
+
+    def request(self, method, url, timed=False, **kwargs):
+        """
+        Send a request through the pool
+
+        :param method: HTTP method. E.g. `GET`
+        :param url: Full URL for request
+        :param timed: (optional) Store the seconds spent opening connections in `connect_time` of the response. Default: False
+        :param **kwargs: Arguments that `requests.Session.request` takes
+        :return: `requests.Response` object
+        """
+        kwargs.setdefault('timeout', self.timeout)
+        if not timed:
+            return self.session.request(method, url, **kwargs)
+        _timing.connect = 0.0
+        r = self.session.request(method, url, **kwargs)
+        r.connect_time = _timing.connect
+        return r
+
+    @staticmethod
+    def body_sizes(response, stream=False):
+        """
+        Return the sizes of the request and response bodies in bytes
+
+        :param response: `requests.Response` object
+        :param stream: (optional) The response body has not been read yet. Default: False
+        :return: Tuple of (sent, received)
+        """
+        body = response.request.body
+        sent = len(body) if body else 0
+        return sent, 0 if stream else len(response.content)
+
+    def close(self):
+        """
+        Close all pooled connections
+        """
+        self.adapter.close()
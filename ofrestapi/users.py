@@ -1,6 +1,6 @@
 # -*- coding: utf-8 -*-
-from requests import (get, put, post, delete)
-from base import Base
+from .base import Base
+from .records import User, RosterItem
 
 
 class Users(Base):
@@ -10,13 +10,14 @@ class Users(Base):
     SUBSCRIPTION_FROM = 2
     SUBSCRIPTION_BOTH = 3
 
-    def __init__(self, host, secret, endpoint='/plugins/restapi/v1/users'):
+    def __init__(self, host, secret, endpoint='/plugins/restapi/v1/users', **kwargs):
         """
         :param host: Scheme://Host/ for API requests
         :param secret: Shared secret key for API requests
         :param endpoint: Endpoint for API requests
+        :param kwargs: (optional) Client options. See `Base`
         """
-        super(Users, self).__init__(host, secret, endpoint)
+        super(Users, self).__init__(host, secret, endpoint, **kwargs)
 
     def get_user(self, username):
         """
@@ -25,7 +26,7 @@ class Users(Base):
         :param username: The exact user name for request
         """
         endpoint = '/'.join([self.endpoint, username])
-        return self._submit_request(get, endpoint)
+        return self._submit_request('GET', endpoint, record=User.from_json, template='/users/{username}')
 
     def get_users(self, query=None):
         """
@@ -34,7 +35,18 @@ class Users(Base):
         :param query: (optional) Search/Filter by user name. This act like the wildcard search %String%
         """
         params = {'search': query} if query else None
-        return self._submit_request(get, self.endpoint, params=params)
+        return self._submit_request('GET', self.endpoint, params=params, record=User.from_list, template='/users')
+
+    def iter_users(self, query=None):
+        """
+        Iterate over all users or users filtered by user name
+
+        The response is streamed and users are yielded one at a time.
+
+        :param query: (optional) Search/Filter by user name. This act like the wildcard search %String%
+        """
+        params = {'search': query} if query else None
+        return self._iter_request('GET', self.endpoint, params=params, record=User.from_json, template='/users')
 
     def add_user(self, username, password, name=None, email=None, props=None):
         """
@@ -55,9 +67,9 @@ class Users(Base):
         if props:
             payload['properties'] = {}
             payload['properties']['property'] = []
-            for key, value in props.iteritems():
+            for key, value in props.items():
                 payload['properties']['property'].append({'@key': key, '@value': value})
-        return self._submit_request(post, self.endpoint, json=payload)
+        return self._submit_request('POST', self.endpoint, json=payload, template='/users')
 
     def delete_user(self, username):
         """
@@ -66,7 +78,7 @@ class Users(Base):
         :param username: The user name
         """
         endpoint = '/'.join([self.endpoint, username])
-        return self._submit_request(delete, endpoint)
+        return self._submit_request('DELETE', endpoint, template='/users/{username}')
 
     def update_user(self, username, newusername=None, password=None, name=None, email=None, props=None):
         """
@@ -89,9 +101,9 @@ class Users(Base):
         if props:
             payload['properties'] = {}
             payload['properties']['property'] = []
-            for key, value in props.iteritems():
+            for key, value in props.items():
                 payload['properties']['property'].append({'@key': key, '@value': value})
-        return self._submit_request(put, endpoint, json=payload)
+        return self._submit_request('PUT', endpoint, json=payload, template='/users/{username}')
 
     def get_user_groups(self, username):
         """
@@ -100,7 +112,7 @@ class Users(Base):
         :param username: The user name
         """
         endpoint = '/'.join([self.endpoint, username, 'groups'])
-        return self._submit_request(get, endpoint)
+        return self._submit_request('GET', endpoint, template='/users/{username}/groups')
 
     def add_user_groups(self, username, groups):
         """
@@ -114,7 +126,7 @@ class Users(Base):
         payload = {
             'groupname': groups,
         }
-        return self._submit_request(post, endpoint, json=payload)
+        return self._submit_request('POST', endpoint, json=payload, template='/users/{username}/groups')
 
     def delete_user_groups(self, username, groups):
         """
@@ -128,7 +140,7 @@ class Users(Base):
         payload = {
             'groupname': groups,
         }
-        return self._submit_request(delete, endpoint, json=payload)
+        return self._submit_request('DELETE', endpoint, json=payload, template='/users/{username}/groups')
 
     def lock_user(self, username):
         """
@@ -137,7 +149,7 @@ class Users(Base):
         :param username: The user name
         """
         endpoint = '/'.join([self.endpoint.rpartition('/')[0], 'lockouts', username])
-        return self._submit_request(post, endpoint)
+        return self._submit_request('POST', endpoint, template='/lockouts/{username}')
 
     def unlock_user(self, username):
         """
@@ -146,7 +158,7 @@ class Users(Base):
         :param username: The user name
         """
         endpoint = '/'.join([self.endpoint.rpartition('/')[0], 'lockouts', username])
-        return self._submit_request(delete, endpoint)
+        return self._submit_request('DELETE', endpoint, template='/lockouts/{username}')
 
     def get_user_roster(self, username):
         """
@@ -155,7 +167,7 @@ class Users(Base):
         :param username: The user name
         """
         endpoint = '/'.join([self.endpoint, username, 'roster'])
-        return self._submit_request(get, endpoint)
+        return self._submit_request('GET', endpoint, record=RosterItem.from_list, template='/users/{username}/roster')
 
     def add_user_roster_item(self, username, jid, name=None, subscription=None, groups=None):
         """
@@ -175,7 +187,7 @@ class Users(Base):
             'subscriptionType': subscription,
             'groups': {'group': groups},
         }
-        return self._submit_request(post, endpoint, json=payload)
+        return self._submit_request('POST', endpoint, json=payload, template='/users/{username}/roster')
 
     def delete_user_roster_item(self, username, jid):
         """
@@ -185,7 +197,7 @@ class Users(Base):
         :param jid: The JID of the roster item to be deleted. E.g. foo@example.org
         """
         endpoint = '/'.join([self.endpoint, username, 'roster', jid])
-        return self._submit_request(delete, endpoint)
+        return self._submit_request('DELETE', endpoint, template='/users/{username}/roster/{jid}')
 
     def update_user_roster_item(self, username, jid, name=None, subscription=None, groups=None):
         """
@@ -205,4 +217,4 @@ class Users(Base):
             'subscriptionType': subscription,
             'groups': {'group': groups},
         }
-        return self._submit_request(put, endpoint, json=payload)
+        return self._submit_request('PUT', endpoint, json=payload, template='/users/{username}/roster/{jid}')
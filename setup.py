@@ -13,5 +13,10 @@ setup(
     author='Sergey Fedotov (seamus-45)',
     author_email='sr.fido@gmail.com',
     url='https://github.com/seamus-45/openfire-restapi',
-    packages=['ofrestapi']
+    packages=['ofrestapi'],
+    python_requires='>=3.8',
+    extras_require={
+        'async': ['httpx'],
+        'fast': ['orjson'],
+    },
 )
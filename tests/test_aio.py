@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+import asyncio
+import unittest
+
+from ofrestapi.throttle import Budget, Throttle
+
+try:
+    # `ofrestapi.aio` needs the `async` extra
+    from ofrestapi.aio import AsyncTransport, AsyncUsers
+except ImportError:
+    AsyncTransport = AsyncUsers = None
+
+requires_httpx = unittest.skipUnless(AsyncTransport, 'requires httpx (pip install openfire-restapi[async])')
+
+
+class HangingTransport(object):
+    """
+    Transport whose requests never complete
+    """
+    connection_errors = (OSError,)
+
+    def __init__(self):
+        self.calls = 0
+
+    async def request(self, method, url, **kwargs):
+        self.calls += 1
+        await asyncio.sleep(3600)
+
+
+@requires_httpx
+class ThrottleCancellationTest(unittest.TestCase):
+
+    def test_cancelled_request_releases_slot(self):
+        transport = HangingTransport()
+        budget = Budget(max_in_flight=1)
+        users = AsyncUsers('http://localhost:9090', 'secret', transport=transport, throttle=Throttle(reads=budget))
+
+        async def main():
+            for _ in range(2):
+                with self.assertRaises(asyncio.TimeoutError):
+                    await asyncio.wait_for(users.get_user('alice'), 0.05)
+                self.assertEqual(budget.stats()['in_flight'], 0)
+
+        asyncio.run(main())
+        self.assertEqual(transport.calls, 2)
+
+
+@requires_httpx
+class AsyncTransportTest(unittest.TestCase):
+
+    def test_pool_per_event_loop(self):
+        transport = AsyncTransport()
+
+        async def clients():
+            return transport.client, transport.client
+
+        first, same = asyncio.run(clients())
+        second, _ = asyncio.run(clients())
+        self.assertIs(first, same)
+        self.assertIsNot(first, second)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+import unittest
+
+from ofrestapi.bulk import BulkResult, add_users, close_sessions
+from ofrestapi.exception import GroupNotFoundException, UserAlreadyExistsException, UserNotFoundException
+
+
+class StubUsers(object):
+
+    def __init__(self, existing=()):
+        self.existing = set(existing)
+
+    def add_user(self, username, password, name=None, email=None, props=None):
+        if username in self.existing:
+            raise UserAlreadyExistsException(username)
+        self.existing.add(username)
+        return True
+
+    def add_user_groups(self, username, groups):
+        if 'missing' in groups:
+            raise GroupNotFoundException('missing')
+        return True
+
+
+class AddUsersTest(unittest.TestCase):
+
+    def test_group_failure_is_partial(self):
+        users = StubUsers(existing=['bob'])
+        specs = [
+            {'username': 'alice', 'password': 'pw', 'groups': ['missing']},
+            {'username': 'bob', 'password': 'pw', 'groups': ['missing']},
+            {'username': 'carol', 'password': 'pw', 'groups': ['staff']},
+        ]
+        results = sorted(add_users(users, specs), key=lambda result: result.index)
+        self.assertEqual([result.status for result in results],
+                         [BulkResult.PARTIAL, BulkResult.PARTIAL, BulkResult.CREATED])
+        self.assertIsInstance(results[0].error, GroupNotFoundException)
+        self.assertIn('alice', users.existing)
+
+
+class StubSessions(object):
+
+    def __init__(self):
+        self.closed = []
+
+    def close_user_sessions(self, username):
+        self.closed.append(username)
+        return True
+
+
+class StubLockouts(object):
+
+    def __init__(self):
+        self.locked = []
+
+    def lock_user(self, username):
+        if username == 'ghost':
+            raise UserNotFoundException(username)
+        self.locked.append(username)
+        return True
+
+
+class CloseSessionsTest(unittest.TestCase):
+
+    def test_lock_failure_still_disconnects(self):
+        sessions, lockouts = StubSessions(), StubLockouts()
+        results = sorted(close_sessions(sessions, usernames=['alice', 'ghost', 'alice'], lock_users=lockouts),
+                         key=lambda result: result.index)
+        self.assertEqual([(result.item, result.status) for result in results],
+                         [('alice', BulkResult.OK), ('ghost', BulkResult.PARTIAL)])
+        self.assertIsInstance(results[1].error, UserNotFoundException)
+        self.assertEqual(sorted(sessions.closed), ['alice', 'ghost'])
+        self.assertEqual(lockouts.locked, ['alice'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,26 @@
+# -*- coding: utf-8 -*-
+import unittest
+
+from ofrestapi.cache import Cache
+
+
+class CacheTest(unittest.TestCase):
+
+    def test_results_are_kept_per_secret(self):
+        cache = Cache()
+        key = cache.make_key('secret', 'http://localhost:9090', '/plugins/restapi/v1/users/bob')
+        cache.set(key, {'username': 'bob'})
+        other = cache.make_key('wrong', 'http://localhost:9090', '/plugins/restapi/v1/users/bob')
+        self.assertEqual(cache.get(other), (False, None, None))
+        self.assertTrue(cache.get(key)[0])
+
+    def test_write_invalidates_every_secret(self):
+        cache = Cache()
+        key = cache.make_key('secret', 'http://localhost:9090', '/plugins/restapi/v1/users/bob')
+        cache.set(key, {'username': 'bob'})
+        cache.invalidate('http://localhost:9090', '/plugins/restapi/v1/users/bob')
+        self.assertEqual(cache.get(key), (False, None, None))
+
+
+if __name__ == '__main__':
+    unittest.main()
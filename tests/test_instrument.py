@@ -0,0 +1,34 @@
+# -*- coding: utf-8 -*-
+import unittest
+
+from ofrestapi import Users
+from ofrestapi.exception import CircuitOpenException
+from ofrestapi.instrument import Metrics
+from ofrestapi.retry import CircuitBreaker
+
+
+class FailingTransport(object):
+    """
+    Transport whose server is unreachable
+    """
+    connection_errors = (OSError,)
+
+    def request(self, method, url, **kwargs):
+        raise OSError('Connection refused')
+
+
+class MetricsTest(unittest.TestCase):
+
+    def test_circuit_open_is_reported(self):
+        metrics = Metrics()
+        users = Users('http://localhost:9090', 'secret', transport=FailingTransport(),
+                      breaker=CircuitBreaker(threshold=1), hooks=[metrics])
+        self.assertRaises(OSError, users.get_user, 'alice')
+        self.assertRaises(CircuitOpenException, users.get_user, 'alice')
+        stats = metrics.snapshot()['GET /users/{username}']
+        self.assertEqual(stats['count'], 2)
+        self.assertEqual(stats['errors'], 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,155 @@
+# -*- coding: utf-8 -*-
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+
+from ofrestapi.exception import CircuitOpenException, InvalidResponseException, UserNotFoundException
+from ofrestapi.outbox import Outbox, entity_key
+
+HOST = 'http://localhost:9090'
+USERS = '/plugins/restapi/v1/users'
+
+
+class Sender(object):
+    """
+    Sender recording the writes, failing each endpoint as often as `failures` says
+    """
+    class transport(object):
+        connection_errors = (OSError,)
+
+    def __init__(self, failures=None, delay=0.0):
+        self.failures = dict(failures or {})
+        self.delay = delay
+        self.sent = []
+        self._lock = threading.Lock()
+
+    def _submit_request(self, method, endpoint, template=None, **kwargs):
+        time.sleep(self.delay)
+        with self._lock:
+            errors = self.failures.get(endpoint)
+            if errors:
+                raise errors.pop(0)
+            self.sent.append((method, endpoint, kwargs.get('json')))
+        return True
+
+
+class Client(object):
+    host = HOST
+
+
+class StubOutbox(Outbox):
+
+    def __init__(self, path, sender, **options):
+        self.sender = sender
+        super(StubOutbox, self).__init__(path, **options)
+
+    def _make_sender(self, client):
+        return self.sender
+
+
+class EntityKeyTest(unittest.TestCase):
+
+    def test_keys(self):
+        self.assertEqual(entity_key(USERS + '/alice/roster/bob@example.org', '/users/{username}/roster/{jid}'),
+                         USERS + '/alice')
+        self.assertEqual(entity_key(USERS, '/users', {'json': {'username': 'alice'}}), USERS + '/alice')
+        self.assertEqual(entity_key('/plugins/restapi/v1/lockouts/alice', '/lockouts/{username}'), USERS + '/alice')
+        self.assertEqual(entity_key('/plugins/restapi/v1/sessions/alice', '/sessions/{username}'), USERS + '/alice')
+        self.assertEqual(entity_key('/plugins/restapi/v1/chatrooms/lobby/owners/alice',
+                                    '/chatrooms/{roomname}/{role}/{username}', {'params': {'servicename': 'muc'}}),
+                         '/plugins/restapi/v1/chatrooms/lobby?servicename=muc')
+
+
+class OutboxTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmp, 'outbox.db')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def test_retryable_errors(self):
+        retryable = lambda error: Outbox._retryable(Sender, error)
+        self.assertTrue(retryable(OSError()))
+        self.assertTrue(retryable(CircuitOpenException()))
+        self.assertTrue(retryable(InvalidResponseException(503)))
+        self.assertTrue(retryable(InvalidResponseException(429)))
+        self.assertFalse(retryable(InvalidResponseException(400)))
+        self.assertFalse(retryable(InvalidResponseException('UnknownException')))
+        self.assertFalse(retryable(UserNotFoundException('bob')))
+
+    def test_collapse_updates(self):
+        sender = Sender()
+        outbox = StubOutbox(self.path, sender)
+        outbox.append(HOST, 'PUT', USERS + '/alice', '/users/{username}', {'json': {'name': 'A', 'email': None}})
+        outbox.append(HOST, 'PUT', USERS + '/alice', '/users/{username}', {'json': {'name': None, 'email': 'a@x'}})
+        outbox.append(HOST, 'DELETE', USERS + '/alice', '/users/{username}')
+        self.assertEqual(outbox.pending(), 2)
+        outbox.bind(Client())
+        self.assertTrue(outbox.drain(5))
+        self.assertEqual(sender.sent, [('PUT', USERS + '/alice', {'name': 'A', 'email': 'a@x'}),
+                                       ('DELETE', USERS + '/alice', None)])
+        self.assertEqual(outbox.stats()['collapsed'], 1)
+        outbox.close()
+
+    def test_order_per_entity(self):
+        sender = Sender(delay=0.002)
+        outbox = StubOutbox(self.path, sender, workers=8)
+        outbox.bind(Client())
+        for step in range(20):
+            for user in ('alice', 'bob', 'carol'):
+                outbox.append(HOST, 'POST', '%s/%s/groups' % (USERS, user), '/users/{username}/groups',
+                              {'json': {'groupname': ['g%d' % step]}})
+        self.assertTrue(outbox.drain(10))
+        for user in ('alice', 'bob', 'carol'):
+            steps = [payload['groupname'][0] for _, endpoint, payload in sender.sent
+                     if endpoint == '%s/%s/groups' % (USERS, user)]
+            self.assertEqual(steps, ['g%d' % step for step in range(20)])
+        outbox.close()
+
+    def test_retry_then_send(self):
+        sender = Sender(failures={USERS + '/alice': [OSError(), InvalidResponseException(503)]})
+        outbox = StubOutbox(self.path, sender, retry_interval=0.01)
+        outbox.bind(Client())
+        outbox.append(HOST, 'DELETE', USERS + '/alice', '/users/{username}')
+        outbox.append(HOST, 'PUT', USERS + '/alice', '/users/{username}', {'json': {'name': 'A'}})
+        self.assertTrue(outbox.drain(5))
+        self.assertEqual([method for method, _, _ in sender.sent], ['DELETE', 'PUT'])
+        self.assertEqual(outbox.stats()['retries'], 2)
+        outbox.close()
+
+    def test_rejected_write_is_given_up(self):
+        errors = []
+        sender = Sender(failures={USERS + '/bob': [UserNotFoundException('bob')]})
+        outbox = StubOutbox(self.path, sender, on_error=lambda op, e: errors.append((op.endpoint, e)))
+        outbox.bind(Client())
+        outbox.append(HOST, 'DELETE', USERS + '/bob', '/users/{username}')
+        outbox.append(HOST, 'PUT', USERS + '/bob', '/users/{username}', {'json': {'name': 'B'}})
+        self.assertTrue(outbox.drain(5))
+        self.assertEqual([method for method, _, _ in sender.sent], ['PUT'])
+        self.assertEqual(len(errors), 1)
+        (op, error), = outbox.failures()
+        self.assertEqual((op.method, op.endpoint), ('DELETE', USERS + '/bob'))
+        self.assertIn('UserNotFoundException', error)
+        outbox.close()
+
+    def test_restart_recovery(self):
+        outbox = StubOutbox(self.path, Sender())
+        outbox.append(HOST, 'POST', USERS, '/users', {'json': {'username': 'alice', 'password': 'pw'}})
+        outbox.append(HOST, 'POST', '/plugins/restapi/v1/lockouts/alice', '/lockouts/{username}')
+        outbox.close()
+        sender = Sender()
+        outbox = StubOutbox(self.path, sender)
+        self.assertEqual(outbox.pending(), 2)
+        outbox.bind(Client())
+        self.assertTrue(outbox.drain(5))
+        self.assertEqual([endpoint for _, endpoint, _ in sender.sent], [USERS, '/plugins/restapi/v1/lockouts/alice'])
+        outbox.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+import unittest
+
+from ofrestapi.properties import PropertyMirror
+
+
+class StubSystem(object):
+    """
+    System client whose `get_props` answer is taken before `before_answer` runs
+    """
+    mirror = None
+
+    def __init__(self, props):
+        self.props = dict(props)
+        self.before_answer = None
+
+    def get_props(self):
+        result = {'property': [{'@key': key, '@value': value} for key, value in sorted(self.props.items())]}
+        if self.before_answer is not None:
+            self.before_answer()
+        return result
+
+    def update_prop(self, key, value):
+        self.props[key] = value
+        self.mirror._written(key, value)
+
+    def delete_prop(self, key):
+        del self.props[key]
+        self.mirror._written(key, None)
+
+
+class PropertyMirrorTest(unittest.TestCase):
+
+    def test_refresh_does_not_revert_concurrent_writes(self):
+        system = StubSystem({'a': '1', 'b': '1'})
+        mirror = PropertyMirror(system, interval=None)
+        changes = []
+        mirror.subscribe(lambda *change: changes.append(change))
+        # Writes land while a refresh with the older list is in flight
+        system.before_answer = lambda: (system.update_prop('a', '2'), system.delete_prop('b'))
+        mirror.refresh()
+        self.assertEqual(mirror.get('a'), '2')
+        self.assertNotIn('b', mirror)
+        self.assertEqual(changes, [('a', '1', '2'), ('b', '1', None)])
+        system.before_answer = None
+        self.assertEqual(mirror.refresh(), {})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,18 @@
+# -*- coding: utf-8 -*-
+import unittest
+
+from ofrestapi.records import Room, User
+
+
+class RecordTest(unittest.TestCase):
+
+    def test_records_are_hashable(self):
+        alice = {'username': 'alice', 'name': 'Alice', 'properties': {'property': {'@key': 'k', '@value': 'v'}}}
+        self.assertEqual(len({User.from_json(alice), User.from_json(dict(alice))}), 1)
+        self.assertNotEqual(hash(User.from_json(alice)), hash(User.from_json(dict(alice, name='Bob'))))
+        room = Room.from_json({'roomName': 'lobby', 'owners': {'owner': ['admin@example.org']}})
+        self.assertIn(room, {room: True})
+
+
+if __name__ == '__main__':
+    unittest.main()
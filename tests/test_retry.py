@@ -0,0 +1,27 @@
+# -*- coding: utf-8 -*-
+import time
+import unittest
+
+from ofrestapi.exception import CircuitOpenException
+from ofrestapi.retry import CircuitBreaker
+
+
+class CircuitBreakerTest(unittest.TestCase):
+
+    def test_abandoned_trial_allows_new_trial(self):
+        breaker = CircuitBreaker(threshold=1, reset_timeout=0.05)
+        breaker.failure()
+        self.assertRaises(CircuitOpenException, breaker.before)
+        time.sleep(0.06)
+        breaker.before()
+        self.assertEqual(breaker.state, CircuitBreaker.HALF_OPEN)
+        # The trial is cancelled: neither failure() nor record() is called
+        self.assertRaises(CircuitOpenException, breaker.before)
+        time.sleep(0.06)
+        breaker.before()
+        breaker.record(200)
+        self.assertEqual(breaker.state, CircuitBreaker.CLOSED)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+import json
+import unittest
+
+from ofrestapi.streaming import ItemParser
+
+
+def parse(body, size):
+    parser = ItemParser()
+    items = []
+    for start in range(0, len(body), size):
+        items.extend(parser.feed(body[start:start + size]))
+    return items, parser.done
+
+
+class ItemParserTest(unittest.TestCase):
+
+    def check(self, document, expected):
+        body = json.dumps(document, ensure_ascii=False).encode('utf-8')
+        for size in range(1, len(body) + 1):
+            items, done = parse(body, size)
+            self.assertEqual(items, expected, 'chunk size %d' % size)
+            self.assertTrue(done, 'chunk size %d' % size)
+
+    def test_objects(self):
+        users = [{'username': 'alice', 'properties': {'property': [{'@key': 'a', '@value': '1'}]}},
+                 {'username': 'bob', 'groups': []}]
+        self.check({'users': users}, users)
+
+    def test_numbers(self):
+        self.check({'sessions': [1, 22, 333, -4.5, 6e10, 0]}, [1, 22, 333, -4.5, 6e10, 0])
+
+    def test_literals(self):
+        self.check({'values': [True, False, None, 7]}, [True, False, None, 7])
+
+    def test_strings_with_escapes_and_multibyte(self):
+        values = ['quote " and \\\\ backslash', 'tab\\t', 'Grüße 日本語 \U0001f600', 'é\\n']
+        self.check({'names': values}, values)
+
+    def test_single_record(self):
+        self.check({'users': {'username': 'alice'}}, [{'username': 'alice'}])
+        self.check({'count': 12345}, [12345])
+
+    def test_empty(self):
+        self.check({'users': []}, [])
+        self.check({}, [])
+
+    def test_incomplete(self):
+        items, done = parse(b'{"sessions": [1, 22', 1)
+        self.assertEqual(items, [1])
+        self.assertFalse(done)
+
+
+if __name__ == '__main__':
+    unittest.main()